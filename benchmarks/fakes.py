@@ -0,0 +1,182 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from query_parser import MONTHS, _parse_date, quick_extract
+
+CONDITIONS = ["clear sky", "few clouds", "overcast clouds", "light rain", "moderate rain"]
+# The fake model's own guess at a destination; deliberately more lenient than quick_extract's fast path
+FAKE_LOCATION_PATTERN = re.compile(r"\b(?:to|for|in|at)\s+([A-Za-z][A-Za-z .'-]*?)(?=\s+(?:on|for|in|from|next|this)\b|\s+\d|\s*[,.?!]|\s*$)", re.IGNORECASE)
+FAKE_NON_LOCATION_WORDS = {"a", "an", "the", "me", "my", "trip", "plan", "travel", "vacation", "holiday", "us"}
+
+def _guess_location(text: str) -> Optional[str]:
+    for match in FAKE_LOCATION_PATTERN.finditer(text):
+        words = match.group(1).strip(" .'-").lower().split()
+        if words and not any(word in FAKE_NON_LOCATION_WORDS for word in words) and not re.fullmatch(MONTHS, words[0]):
+            return " ".join(words).title()
+    return None
+
+class FakeUpstreamServer:
+    # Local stand-in for OpenWeatherMap and Skyscanner with configurable latency and failure rate
+    def __init__(self, latency: float = 0.2, failure_rate: float = 0.0, forecast_start: str = "2024-08-28", seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.forecast_start = datetime.strptime(forecast_start, "%Y-%m-%d")
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-upstream", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "FakeUpstreamServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            return self._random.random() < self.failure_rate
+
+    def _forecast(self, location: str) -> dict:
+        # 5 days of 3-hour slots, deterministic per location
+        seed = int(hashlib.sha256(location.lower().encode()).hexdigest(), 16) % 1000
+        slots = []
+        for i in range(40):
+            moment = self.forecast_start + timedelta(hours=3 * i)
+            slots.append({
+                "dt_txt": moment.strftime("%Y-%m-%d %H:%M:%S"),
+                "main": {"temp": round(15 + seed % 20 + 5 * np.sin(i / 8 * np.pi), 2)},
+                "weather": [{"description": CONDITIONS[(seed + i // 8) % len(CONDITIONS)]}],
+            })
+        return {"list": slots}
+
+    @staticmethod
+    def _hotels(location: str) -> dict:
+        return {"data": [
+            {"entityName": f"{location} Grand Hotel", "pois": [{"entityName": f"{location} Old Town"}, {"entityName": f"{location} Museum"}]},
+            {"entityName": f"{location} Central Inn", "pois": []},
+            {"entityName": f"{location} Riverside Suites", "pois": [{"entityName": f"{location} Harbour"}]},
+        ]}
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                time.sleep(upstream.latency)
+                if upstream._should_fail():
+                    self.send_error(503)
+                    return
+                parts = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                if parts.path == "/data/2.5/forecast":
+                    body = upstream._forecast(query.get("q", ""))
+                elif parts.path == "/api/v1/hotels/auto-complete":
+                    body = upstream._hotels(query.get("query", ""))
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+class FakeChatModel(BaseChatModel):
+    # Drop-in for ChatGoogleGenerativeAI: answers the app's prompts after a simulated delay
+    latency: float = 0.5
+    failure_rate: float = 0.0
+    tokens_per_second: float = 200.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _simulate(self) -> None:
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Simulated LLM failure")
+
+    @staticmethod
+    def _respond(messages: List[BaseMessage]) -> str:
+        prompt = str(messages[-1].content)
+        quoted = re.search(r"'(.*?)'", prompt)
+        query = quoted.group(1) if quoted else prompt
+        if "Return only a JSON object" in prompt:
+            result = quick_extract(query) or {"intent": "create", "location": _guess_location(query), "date": _parse_date(query)}
+            return json.dumps(result)
+        if prompt.startswith("Analyze the following user query"):
+            return "retrieve" if re.search(r"saved|look up|retrieve", query, re.IGNORECASE) else "create"
+        if prompt.startswith("Extract the location"):
+            return _guess_location(query) or "The provided query does not contain a location."
+        if prompt.startswith("Extract and convert the date"):
+            return _parse_date(query) or ""
+        location = re.search(r"(?:Location: |trip plan for |Trip Plan for )([^\n.]+)", prompt)
+        location_name = location.group(1).strip() if location else "your destination"
+        if "overview" in prompt.lower() and "Suggested Journey" not in prompt:
+            return f"{location_name} is a vibrant place full of history and great food. You will love exploring it!"
+        return (
+            f"## Trip Plan for {location_name}\n\n### Suggested Journey:\n"
+            "* **Morning:** Visit the old town and grab breakfast at a local cafe.\n"
+            "* **Afternoon:** Tour the main museum and relax in the city park.\n"
+            "* **Evening:** Dine by the river and enjoy the nightlife.\n\n"
+            "### Tips:\n- Pack for the weather.\n- Book popular restaurants early.\n\n"
+            "Would you like to save this trip plan to your favorites?"
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._simulate()
+        text = self._respond(messages)
+        time.sleep(len(text.split()) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # latency models time to first token, then words arrive at tokens_per_second
+        self._simulate()
+        for word in re.findall(r"\S+\s*", self._respond(messages)):
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+class HashingEncoder:
+    # Deterministic bag-of-words embeddings, standing in for SentenceTransformer without a model download
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            bucket = int(hashlib.md5(token.encode()).hexdigest(), 16) % self.dimension
+            vector[bucket] += 1.0
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def encode(self, texts: Union[str, List[str]], **kwargs: Any) -> np.ndarray:
+        if isinstance(texts, str):
+            return self._embed(texts)
+        return np.stack([self._embed(text) for text in texts]) if texts else np.empty((0, self.dimension), dtype=np.float32)
@@ -0,0 +1,213 @@
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from fakes import FakeChatModel, FakeUpstreamServer, HashingEncoder
+from cache import TTLCache
+from http_client import HttpClient
+from query_parser import analyze_query, extract_location_and_date
+from weather_service import WeatherService
+from accommodation_service import AccommodationService
+from trip_planner import TripPlanner
+from embedding_cache import EmbeddingCache
+from vector_store import VectorStore
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baselines.json")
+QUERY_LOG = os.path.join(ROOT, "logs.csv")
+USER_INPUT_COLUMN = 2
+# Allowed slowdown relative to the stored baseline before a scenario counts as a regression
+TOLERANCE = 0.2
+BENCH_KEY = "benchmark"
+
+def load_queries(path: str = QUERY_LOG) -> List[str]:
+    # Every logged user turn, duplicates included, so the mix matches real traffic
+    queries = []
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) <= USER_INPUT_COLUMN:
+                continue
+            text = row[USER_INPUT_COLUMN].strip()
+            # Favourite rows store a metadata dict rather than a chat message
+            if text and not text.startswith("{"):
+                queries.append(text)
+    return queries
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def _percentile(ordered: List[float], quantile: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+def run_scenario(name: str, call: Callable[[Any], Any], items: List[Any], concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    failures: List[Exception] = []  # list.append is thread-safe, a shared int counter is not
+
+    def timed_call(item: Any) -> None:
+        started = time.perf_counter()
+        try:
+            call(item)
+        except Exception as e:
+            failures.append(e)
+        latencies.append(time.perf_counter() - started)
+
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_call, items))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+
+    errors = len(failures)
+    ordered = sorted(latencies)
+    result = {
+        "requests": len(items),
+        "errors": errors,
+        "throughput": len(items) / elapsed if elapsed else 0.0,
+        "p50": _percentile(ordered, 0.5),
+        "p95": _percentile(ordered, 0.95),
+        "p99": _percentile(ordered, 0.99),
+        "peak_traced_mb": peak / (1024 * 1024),
+        "max_rss_mb": _max_rss_mb(),
+    }
+    print(f"{name:<22} {result['requests']:>6} {errors:>6} {result['throughput']:>10.2f} "
+          f"{result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f} "
+          f"{result['peak_traced_mb']:>9.1f} {result['max_rss_mb']:>9.1f}")
+    return result
+
+def build_planner(args: argparse.Namespace, llm: FakeChatModel, upstream_url: str) -> TripPlanner:
+    http = HttpClient(backoff=0.05)
+    # Caches stay cold unless asked, so every call exercises the HTTP path
+    ttl = 3600 if args.warm_caches else 0
+    weather = WeatherService(api_key=BENCH_KEY, cache=TTLCache(ttl), http=http, base_url=upstream_url)
+    accommodation = AccommodationService(api_key=BENCH_KEY, cache=TTLCache(ttl), http=http, base_url=upstream_url)
+    # The production rate limits would measure the token bucket, not the pipeline
+    http.limit(BENCH_KEY, 10_000)
+    return TripPlanner(weather, accommodation, llm=llm)
+
+def build_vector_store(args: argparse.Namespace, directory: str) -> VectorStore:
+    if args.fake_embeddings:
+        model = HashingEncoder()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+    return VectorStore(
+        dimension=model.get_sentence_embedding_dimension(),
+        index_path=os.path.join(directory, "trip_plan_index.faiss"),
+        metadata_path=os.path.join(directory, "trip_plan_metadata.json"),
+        log_path=os.path.join(directory, "trip_plan_log.jsonl"),
+        model=model,
+        embedding_cache=EmbeddingCache(model),
+    )
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    queries = load_queries(args.queries)[: args.limit] * args.iterations
+    llm = FakeChatModel(latency=args.llm_latency, failure_rate=args.failure_rate)
+    extracted = [analyze_query(query, llm) for query in dict.fromkeys(queries)] if queries else []
+    plans = [(item["location"], item["date"]) for item in extracted if item["intent"] == "create" and item["location"] and item["date"]]
+    plans = (plans * (len(queries) // max(1, len(plans)) + 1))[: len(queries)]
+    locations = [location for location, _ in plans] or ["Paris"]
+
+    print(f"{len(queries)} queries replayed from {args.queries}, concurrency {args.concurrency}")
+    print(f"{'scenario':<22} {'reqs':>6} {'errors':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>9} {'rss MB':>9}")
+
+    tracemalloc.start()
+    results: Dict[str, Dict[str, float]] = {}
+    with FakeUpstreamServer(latency=args.api_latency, failure_rate=args.failure_rate) as upstream:
+        planner = build_planner(args, llm, upstream.url)
+        results["analyze_query"] = run_scenario("analyze_query", lambda query: analyze_query(query, llm), queries, args.concurrency)
+        results["extract_location_date"] = run_scenario("extract_location_date", lambda query: extract_location_and_date(query, llm), queries, args.concurrency)
+        results["generate_plan"] = run_scenario("generate_plan", lambda plan: planner.generate_plan(*plan, force_refresh=True), plans, args.concurrency)
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_store = build_vector_store(args, directory)
+        # The item number keeps every text unique, otherwise repeated plans are deduplicated instead of inserted
+        documents = [(f"Trip plan {i} for {location} on {date}: museums, food markets and a river walk.", {"location": location, "date_range": date})
+                     for i, (location, date) in enumerate(plans)]
+        results["vector_add_plan"] = run_scenario("vector_add_plan", lambda document: vector_store.add_plan(*document), documents, args.concurrency)
+
+        def retrieve(location: str) -> None:
+            try:
+                vector_store.retrieve_trip_plan(location)
+            except IndexError:
+                pass  # No match is a valid outcome, not a benchmark error
+
+        results["vector_retrieve_plan"] = run_scenario("vector_retrieve_plan", retrieve, locations, args.concurrency)
+    tracemalloc.stop()
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        if result["p95"] > baseline["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95'] * 1000:.1f} ms vs baseline {baseline['p95'] * 1000:.1f} ms")
+        if result["throughput"] < baseline["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput']:.2f} req/s vs baseline {baseline['throughput']:.2f} req/s")
+        if result["errors"] > baseline["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors vs baseline {baseline['errors']}")
+    return regressions
+
+def _config(args: argparse.Namespace) -> Dict[str, Any]:
+    # Baselines are only comparable when recorded with the same settings
+    return {key: getattr(args, key) for key in ("limit", "iterations", "concurrency", "llm_latency", "api_latency", "failure_rate", "fake_embeddings", "warm_caches")}
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the trip planner offline against local fakes of Gemini, OpenWeatherMap and Skyscanner.")
+    parser.add_argument("--queries", default=QUERY_LOG, help="logs.csv to replay user inputs from")
+    parser.add_argument("--limit", type=int, help="Only replay the first N logged queries")
+    parser.add_argument("--iterations", type=int, default=1, help="Times the query mix is replayed")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests per scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds to first LLM token")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Simulated seconds per weather/hotel API request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of LLM and API calls that fail")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use a hashing encoder instead of loading the MiniLM model")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep forecast and hotel caches enabled")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed relative slowdown before failing")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": _config(args), "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != _config(args):
+        print("Warning: baseline was recorded with different settings, comparison may be misleading.")
+    regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    if regressions:
+        print("Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,28 @@
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from cache import HOTELS_TTL, TTLCache, normalize_location
+from http_client import HttpClient
+
+# Requests per second allowed per RapidAPI key
+RATE_LIMIT = 5.0
+BASE_URL = "https://skyscanner80.p.rapidapi.com"
 
 class AccommodationService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[Any] = None, http: Optional[HttpClient] = None, base_url: str = BASE_URL):
         self.api_key = api_key
+        self.base_url = base_url
         self.api_host = "skyscanner80.p.rapidapi.com"
+        self.cache = cache if cache is not None else TTLCache(HOTELS_TTL)
+        self.http = http or HttpClient()
+        self.http.limit(api_key, RATE_LIMIT)
 
     def get_hotels(self, query: str, market: str = "US", locale: str = "en-US") -> List[Dict[str, Any]]:
-        url = "https://skyscanner80.p.rapidapi.com/api/v1/hotels/auto-complete"
+        cache_key = f"{normalize_location(query)}|{market}|{locale}"
+        cached_hotels = self.cache.get(cache_key)
+        if cached_hotels is not None:
+            return cached_hotels
+
+        url = f"{self.base_url}/api/v1/hotels/auto-complete"
         headers = {
             "x-rapidapi-key": self.api_key,
             "x-rapidapi-host": self.api_host
@@ -19,8 +34,7 @@ class AccommodationService:
         }
 
         try:
-            response = requests.get(url, headers=headers, params=querystring)
-            response.raise_for_status()
+            response = self.http.get(url, headers=headers, params=querystring, rate_limit_key=self.api_key)
             data = response.json()
             
             hotels = []
@@ -34,6 +48,10 @@ class AccommodationService:
                 if pois:
                     for poi in pois:
                         hotels.append(poi.get('entityName'))
+
+            # Empty results are not cached so a transient upstream gap is retried next time
+            if hotels:
+                self.cache.set(cache_key, hotels)
             return hotels
 
         except requests.exceptions.RequestException as e:
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import functools
+from typing import Any, Callable
+from aiohttp import web
+from resources import get_trip_service, warm_up
+from service import TripService
+
+DEFAULT_PORT = 8080
+# Requests run in worker threads; beyond this many the rest queue instead of piling onto the LLM
+MAX_CONCURRENCY = 8
+
+SERVICE_KEY = web.AppKey("service", TripService)
+LIMIT_KEY = web.AppKey("limit", asyncio.Semaphore)
+
+async def _run(request: web.Request, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    # The pipeline is blocking (requests, LLMChain, FAISS), so keep it off the event loop
+    async with request.app[LIMIT_KEY]:
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+async def _json_body(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Request body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Request body must be a JSON object")
+    return body
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+async def query(request: web.Request) -> web.Response:
+    # {"query": "plan a trip to Rome on 2024-09-01", "user_id": optional, "force_refresh": optional}
+    body = await _json_body(request)
+    if not isinstance(body.get("query"), str) or not body["query"].strip():
+        raise web.HTTPBadRequest(text="'query' is required")
+    result = await _run(request, request.app[SERVICE_KEY].handle, body["query"], user_id=body.get("user_id"),
+                        force_refresh=bool(body.get("force_refresh")))
+    return web.json_response(result)
+
+async def retrieve(request: web.Request) -> web.Response:
+    location = request.query.get("location")
+    if not location:
+        raise web.HTTPBadRequest(text="'location' is required")
+    analysis = {"intent": "retrieve", "location": location, "date": None, "prompt": "", "response": ""}
+    result = await _run(request, request.app[SERVICE_KEY].retrieve, f"retrieve my plan to {location}", analysis,
+                        user_id=request.query.get("user_id"))
+    return web.json_response(result)
+
+async def save_favorite(request: web.Request) -> web.Response:
+    # {"trip_plan": "...", "metadata": {"location": ..., "date_range": ..., "user_id": optional}}
+    body = await _json_body(request)
+    metadata = body.get("metadata")
+    if not body.get("trip_plan") or not isinstance(metadata, dict) or not metadata.get("location") or not metadata.get("date_range"):
+        raise web.HTTPBadRequest(text="'trip_plan', 'metadata.location' and 'metadata.date_range' are required")
+    plan_id = await _run(request, request.app[SERVICE_KEY].save_favorite, body["trip_plan"], metadata)
+    return web.json_response({"plan_id": plan_id}, status=201)
+
+def create_app(service: TripService, max_concurrency: int = MAX_CONCURRENCY) -> web.Application:
+    app = web.Application()
+    app[SERVICE_KEY] = service
+    app[LIMIT_KEY] = asyncio.Semaphore(max_concurrency)
+    app.router.add_get("/health", health)
+    app.router.add_post("/query", query)
+    app.router.add_get("/plans", retrieve)
+    app.router.add_post("/favorites", save_favorite)
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the trip planner over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Requests processed at once")
+    args = parser.parse_args()
+
+    warm_up(background=False)
+    web.run_app(create_app(get_trip_service(), args.concurrency), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
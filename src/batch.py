@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+# Fields tried in order for the query text and for an id carried through to the output
+QUERY_FIELDS = ("query", "user_input", "body")
+ID_FIELDS = ("id", "request_id")
+MAX_CONCURRENCY = 4
+
+def read_queries(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    # One JSON object per line; plain strings are accepted as bare queries
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            query = next((record[field] for field in QUERY_FIELDS if isinstance(record.get(field), str)), None)
+            if query is None:
+                print(f"Skipping line {number}: no {'/'.join(QUERY_FIELDS)} field")
+                continue
+            record_id = next((str(record[field]) for field in ID_FIELDS if field in record), str(number))
+            yield record_id, {"query": query, "user_id": record.get("user_id")}
+
+def completed_ids(path: str) -> Set[str]:
+    # Ids already written by an earlier, interrupted run
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                continue  # A torn last line from a crash is simply redone
+    return done
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run trip planner queries from a JSONL file without the UI.")
+    parser.add_argument("source", help="JSONL file with one {\"query\": ..., \"id\": optional, \"user_id\": optional} object per line")
+    parser.add_argument("--output", default="batch_results.jsonl", help="Results are appended here as each query finishes")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Queries processed at once")
+    parser.add_argument("--force-refresh", action="store_true", help="Skip the plan cache")
+    parser.add_argument("--restart", action="store_true", help="Ignore results already in --output instead of resuming")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        sys.exit(f"No such file: {args.source}")
+    done = set() if args.restart else completed_ids(args.output)
+    pending = [(record_id, item) for record_id, item in read_queries(args.source) if record_id not in done]
+    print(f"{len(pending)} queries to run, {len(done)} already in {args.output}")
+
+    # Imported lazily so --help works without loading the models
+    from resources import get_trip_service
+
+    service = get_trip_service()
+
+    def run(record_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        # Queries for the same place and date share weather, hotel and overview fetches inside the service
+        try:
+            return {"id": record_id, **service.handle(item["query"], user_id=item["user_id"], force_refresh=args.force_refresh)}
+        except Exception as e:
+            return {"id": record_id, "query": item["query"], "error": str(e)}
+
+    if not args.restart and os.path.exists(args.output) and os.path.getsize(args.output):
+        with open(args.output, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")  # Keep new results off a torn last line
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor, open(args.output, "w" if args.restart else "a", encoding="utf-8") as out:
+        futures = [executor.submit(run, record_id, item) for record_id, item in pending]
+        for finished, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            failed += "error" in result
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[{finished}/{len(futures)}] {result['id']}: {result.get('action', 'error')} {result.get('location') or ''}")
+    print(f"Done: {len(pending) - failed} succeeded, {failed} failed. Results in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Default TTLs (seconds) for the external service caches
+FORECAST_TTL = 30 * 60
+HOTELS_TTL = 24 * 60 * 60
+
+def normalize_location(location: str) -> str:
+    # "  New  York!" and "new york" should share a cache entry
+    location = re.sub(r"[^\w\s-]", " ", location.lower())
+    return " ".join(location.split())
+
+class TTLCache:
+    # In-memory cache with per-entry expiry and bounded LRU eviction
+    def __init__(self, ttl: float, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+class SQLiteCache:
+    # On-disk cache that survives restarts; values must be JSON serializable
+    def __init__(self, path: str, namespace: str, ttl: float, maxsize: int = 10000):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now + self.ttl, now),
+            )
+            # Evict the least recently used entries beyond maxsize
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.maxsize),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+# Shared caches live at module level because Streamlit re-executes main() on every rerun
+_caches: Dict[Tuple[str, Optional[str]], Any] = {}
+_caches_lock = threading.Lock()
+
+def get_cache(namespace: str, ttl: float, maxsize: int = 256, sqlite_path: Optional[str] = None):
+    # Use the SQLite backend when a path is configured, otherwise stay in memory
+    with _caches_lock:
+        key = (namespace, sqlite_path)
+        if key not in _caches:
+            if sqlite_path:
+                _caches[key] = SQLiteCache(sqlite_path, namespace, ttl, maxsize=maxsize)
+            else:
+                _caches[key] = TTLCache(ttl, maxsize=maxsize)
+        return _caches[key]
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+class EmbeddingCache:
+    # Content-hash keyed cache in front of SentenceTransformer.encode
+    def __init__(self, model: SentenceTransformer, maxsize: int = 4096, store_path: Optional[str] = None, initial_capacity: int = 1024):
+        self.model = model
+        self.maxsize = maxsize
+        self.store_path = store_path  # Optional memory-mapped .npy file shared across restarts
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._store: Optional[np.ndarray] = None
+        self._rows: Dict[str, int] = {}
+        self._initial_capacity = initial_capacity
+        if store_path:
+            self._open_store()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @property
+    def _keys_path(self) -> str:
+        return f"{self.store_path}.keys"
+
+    def _open_store(self) -> None:
+        # Row i of the .npy file holds the embedding for line i of the keys file
+        if os.path.exists(self.store_path) and os.path.exists(self._keys_path):
+            self._store = np.load(self.store_path, mmap_mode="r+")
+            with open(self._keys_path, "r") as f:
+                keys = [line.strip() for line in f if line.strip()]
+            # Keys are appended after their row is flushed, so every listed key has a vector
+            self._rows = {key: row for row, key in enumerate(keys[:len(self._store)])}
+
+    def _store_put(self, keys: List[str], embeddings: np.ndarray) -> None:
+        # All rows from one encode() go in together: a single flush, then a single append to the keys file
+        if self._store is None:
+            self._store = np.lib.format.open_memmap(self.store_path, mode="w+", dtype=np.float32, shape=(self._initial_capacity, embeddings.shape[1]))
+            open(self._keys_path, "w").close()
+        row = len(self._rows)
+        if row + len(keys) > len(self._store):
+            # Double the file until the batch fits and copy the existing rows across
+            capacity = len(self._store)
+            while row + len(keys) > capacity:
+                capacity *= 2
+            grown = np.lib.format.open_memmap(f"{self.store_path}.tmp", mode="w+", dtype=np.float32, shape=(capacity, self._store.shape[1]))
+            grown[:row] = self._store[:row]
+            grown.flush()
+            del grown
+            self._store = None
+            os.replace(f"{self.store_path}.tmp", self.store_path)
+            self._store = np.load(self.store_path, mmap_mode="r+")
+        self._store[row:row + len(keys)] = embeddings
+        self._store.flush()
+        with open(self._keys_path, "a") as f:
+            f.write("".join(key + "\n" for key in keys))
+        for offset, key in enumerate(keys):
+            self._rows[key] = row + offset
+
+    def _lookup(self, key: str, remember: bool = True) -> Optional[np.ndarray]:
+        embedding = self._memory.get(key)
+        if embedding is not None:
+            self._memory.move_to_end(key)
+            return embedding
+        row = self._rows.get(key)
+        if row is not None:
+            embedding = np.array(self._store[row])
+            if remember:
+                self._remember(key, embedding)
+            return embedding
+        return None
+
+    def _remember(self, key: str, embedding: np.ndarray) -> None:
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def encode(self, texts: Union[str, List[str]], remember: bool = True) -> np.ndarray:
+        # Same shape contract as SentenceTransformer.encode: a string gives 1-D, a list gives 2-D.
+        # remember=False keeps bulk encodes (plans being saved) from evicting hot queries from the in-memory LRU
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        keys = [self.key(text) for text in batch]
+
+        results: List[Optional[np.ndarray]] = [None] * len(batch)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for position, key in enumerate(keys):
+                embedding = self._lookup(key, remember)
+                if embedding is None:
+                    missing.setdefault(key, []).append(position)
+                    self.misses += 1
+                else:
+                    results[position] = embedding
+                    self.hits += 1
+
+        if missing:
+            # Only texts never seen before go through the transformer, in a single batch
+            texts_to_encode = [batch[positions[0]] for positions in missing.values()]
+            embeddings = np.asarray(self.model.encode(texts_to_encode), dtype=np.float32).reshape(len(texts_to_encode), -1)
+            with self._lock:
+                new_keys: List[str] = []
+                new_rows: List[np.ndarray] = []
+                for (key, positions), embedding in zip(missing.items(), embeddings):
+                    if remember:
+                        self._remember(key, embedding)
+                    if self.store_path and key not in self._rows:
+                        new_keys.append(key)
+                        new_rows.append(embedding)
+                    for position in positions:
+                        results[position] = embedding
+                if new_keys:
+                    self._store_put(new_keys, np.stack(new_rows))
+
+        return results[0] if single else np.stack(results)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory), "stored_entries": len(self._rows)}
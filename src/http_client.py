@@ -0,0 +1,209 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10.0)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    # Raised without touching the network while an upstream is failing
+    pass
+
+class TokenBucket:
+    # Client-side rate limiter: `rate` requests per second with bursts up to `capacity`
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # Takes a token and returns how long the caller must wait before using it
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures and lets one probe through after `reset_timeout`
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: allow a probe; another failure re-opens the breaker
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+class _RetryPolicy:
+    # Shared by the sync and async clients: rate limiting, breakers and jittered backoff
+    def __init__(self, max_retries: int, backoff: float, max_backoff: float, rate_limit: Optional[float],
+                 failure_threshold: int, reset_timeout: float):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limit = rate_limit
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def limit(self, key: str, rate: float, capacity: Optional[float] = None) -> None:
+        with self._lock:
+            self._buckets[key] = TokenBucket(rate, capacity)
+
+    def bucket(self, key: Optional[str]) -> Optional[TokenBucket]:
+        if key is None:
+            return None
+        with self._lock:
+            if key not in self._buckets:
+                if self.rate_limit is None:
+                    return None
+                self._buckets[key] = TokenBucket(self.rate_limit)
+            return self._buckets[key]
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        # Honour Retry-After on 429/503, otherwise full-jitter exponential backoff
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+class HttpClient:
+    # Pooled keep-alive session with timeouts, retries, per-key rate limits and per-host circuit breakers
+    def __init__(self, timeout: Tuple[float, float] = DEFAULT_TIMEOUT, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 8.0, rate_limit: Optional[float] = None, pool_size: int = 20,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.timeout = timeout
+        self.policy = _RetryPolicy(max_retries, backoff, max_backoff, rate_limit, failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def limit(self, key: str, rate: float, capacity: Optional[float] = None) -> None:
+        # Cap requests made with `rate_limit_key=key` (e.g. one API key) to `rate` per second
+        self.policy.limit(key, rate, capacity)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+            rate_limit_key: Optional[str] = None) -> requests.Response:
+        breaker = self.policy.breaker(url)
+        bucket = self.policy.bucket(rate_limit_key)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+            if bucket:
+                bucket.acquire()
+
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                error: Exception = requests.exceptions.HTTPError(f"{response.status_code} for url: {response.url}", response=response)
+                retry_after = response.headers.get("Retry-After")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+
+            breaker.record_failure()
+            if attempt >= self.policy.max_retries:
+                raise error
+            time.sleep(self.policy.delay(attempt, retry_after))
+            attempt += 1
+
+class AsyncHttpClient:
+    # asyncio variant of HttpClient backed by a pooled httpx.AsyncClient
+    def __init__(self, timeout: Tuple[float, float] = DEFAULT_TIMEOUT, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 8.0, rate_limit: Optional[float] = None, pool_size: int = 20,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.policy = _RetryPolicy(max_retries, backoff, max_backoff, rate_limit, failure_threshold, reset_timeout)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    def limit(self, key: str, rate: float, capacity: Optional[float] = None) -> None:
+        self.policy.limit(key, rate, capacity)
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+                  rate_limit_key: Optional[str] = None) -> httpx.Response:
+        breaker = self.policy.breaker(url)
+        bucket = self.policy.bucket(rate_limit_key)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+            if bucket:
+                wait = bucket.reserve()
+                if wait:
+                    await asyncio.sleep(wait)
+
+            retry_after = None
+            try:
+                response = await self.client.get(url, params=params, headers=headers)
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                error: Exception = httpx.HTTPStatusError(f"{response.status_code} for url: {response.url}", request=response.request, response=response)
+                retry_after = response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                error = e
+
+            breaker.record_failure()
+            if attempt >= self.policy.max_retries:
+                raise error
+            await asyncio.sleep(self.policy.delay(attempt, retry_after))
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,113 @@
+import argparse
+import ast
+import csv
+import json
+import re
+import sys
+from typing import Dict, Iterator, Optional, Tuple
+
+# Column positions in logs.csv; rows carry more columns than the header declares
+USER_INPUT_COLUMN = 2
+GENERATED_PLAN_COLUMN = 6
+
+GENERATED_HEADER = re.compile(r"^\*\*Generated Trip Plan for (?P<location>.+?) \((?P<date_range>[^)]*)\):\*\*\n", re.DOTALL)
+
+def _plan_from_log_row(user_input: str, plan: str) -> Optional[Tuple[str, Dict]]:
+    if not plan:
+        return None
+
+    # Rows for generated plans carry location and date in the response header
+    match = GENERATED_HEADER.match(plan)
+    if match:
+        return plan[match.end():], {"location": match.group("location"), "date_range": match.group("date_range")}
+
+    # Favourite rows store the metadata dict in the user input column and the bare plan
+    try:
+        metadata = ast.literal_eval(user_input)
+    except (ValueError, SyntaxError):
+        return None
+    if isinstance(metadata, dict) and "location" in metadata and "date_range" in metadata:
+        return plan, {"location": metadata["location"], "date_range": metadata["date_range"]}
+    return None
+
+def read_log_csv(path: str) -> Iterator[Tuple[str, Dict]]:
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip the header
+        for row in reader:
+            if len(row) <= GENERATED_PLAN_COLUMN:
+                continue
+            plan = _plan_from_log_row(row[USER_INPUT_COLUMN], row[GENERATED_PLAN_COLUMN])
+            if plan:
+                yield plan
+
+def _split_plan(record: Dict) -> Tuple[str, Dict]:
+    trip_plan = record.pop("trip_plan")
+    record.pop("content_hash", None)
+    return trip_plan, record
+
+def read_jsonl(path: str) -> Iterator[Tuple[str, Dict]]:
+    # One {"trip_plan": ..., "location": ..., "date_range": ..., ...} object per line, rows from logs.jsonl,
+    # or another store's trip_plan_log.jsonl
+    live: Dict[int, Dict] = {}  # A store log is replayed like VectorStore._live_records, so deletes stay deleted
+    store_records = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "generated_plan" in record:
+                plan = _plan_from_log_row(record.get("user_input", ""), record["generated_plan"])
+                if plan:
+                    yield plan
+                continue
+            if "op" in record or "embedding" in record:
+                # Records written before plan IDs existed are adds keyed by log position
+                plan_id = record.get("id", store_records)
+                store_records += 1
+                if record.get("op", "add") == "add":
+                    live[plan_id] = record["metadata"]
+                elif record["op"] == "delete":
+                    live.pop(plan_id, None)
+                continue
+            yield _split_plan(record)
+    for metadata in live.values():
+        yield _split_plan(metadata)
+
+def read_metadata_json(path: str) -> Iterator[Tuple[str, Dict]]:
+    # The legacy trip_plan_metadata.json format: a list of metadata dicts
+    with open(path, "r") as f:
+        for record in json.load(f):
+            yield _split_plan(record)
+
+READERS = {".csv": read_log_csv, ".jsonl": read_jsonl, ".json": read_metadata_json}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import trip plans into the vector store.")
+    parser.add_argument("source", help="logs.csv, logs.jsonl, a JSONL export or a legacy metadata JSON file")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Plans encoded and persisted per batch")
+    parser.add_argument("--user-id", help="Assign every imported plan to this user")
+    args = parser.parse_args()
+
+    extension = args.source[args.source.rfind("."):].lower()
+    if extension not in READERS:
+        sys.exit(f"Unsupported file type '{extension}', expected one of {', '.join(READERS)}")
+
+    def plans() -> Iterator[Tuple[str, Dict]]:
+        for trip_plan, metadata in READERS[extension](args.source):
+            if args.user_id:
+                metadata["user_id"] = args.user_id
+            yield trip_plan, metadata
+
+    # Imported lazily so --help works without loading the embedding model
+    from resources import get_vector_store
+
+    vector_store = get_vector_store()
+    before = len(vector_store.metadata)
+    plan_ids = vector_store.add_plans(plans(), chunk_size=args.chunk_size)
+    vector_store.save()
+    added = len(vector_store.metadata) - before
+    print(f"Read {len(plan_ids)} plans, stored {added} new, skipped {len(plan_ids) - added} duplicates.")
+
+if __name__ == "__main__":
+    main()
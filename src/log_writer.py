@@ -0,0 +1,105 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Fixed schema: every row carries every field, keyed by the labels the app already uses
+LOG_SCHEMA = {
+    "Model Name": "model_name",
+    "LLM Hyperparameters": "llm_hyperparameters",
+    "User Input": "user_input",
+    "Full Prompt": "full_prompt",
+    "API Request": "api_request",
+    "API Response": "api_response",
+    "Generated Plan": "generated_plan",
+    "Follow-up Question": "follow_up_question",
+    "Favorite Saved": "favorite_saved",
+}
+
+class LogWriter:
+    # Call sites enqueue rows; a background thread batches them into a rotating JSONL file
+    def __init__(self, path: str = "logs.jsonl", max_bytes: int = 10 * 1024 * 1024, max_age: float = 24 * 60 * 60,
+                 batch_size: int = 100, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, str]]" = queue.Queue(maxsize=max_queue)
+        self._opened_at = self._created_at() or time.time()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, data: Dict[str, Any]) -> None:
+        unknown = set(data) - set(LOG_SCHEMA)
+        if unknown:
+            raise ValueError(f"Unknown log fields: {', '.join(sorted(unknown))}")
+        row = {"timestamp": datetime.now(timezone.utc).isoformat()}
+        row.update({field: str(data.get(label, "")) for label, field in LOG_SCHEMA.items()})
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Never block the request thread on logging
+            self.dropped += 1
+
+    def _drain(self) -> List[Dict[str, str]]:
+        rows: List[Dict[str, str]] = []
+        try:
+            rows.append(self._queue.get(timeout=self.flush_interval))
+            while len(rows) < self.batch_size:
+                rows.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return rows
+
+    def _created_at(self) -> Optional[float]:
+        # The file's age is its first row's timestamp; mtime moves on every append
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return datetime.fromisoformat(json.loads(f.readline())["timestamp"]).timestamp()
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _rotated_path(self) -> str:
+        # Microseconds plus a counter, so two rotations in the same second never overwrite each other
+        root, ext = os.path.splitext(self.path)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        candidate, counter = f"{root}-{stamp}{ext}", 1
+        while os.path.exists(candidate):
+            candidate, counter = f"{root}-{stamp}-{counter}{ext}", counter + 1
+        return candidate
+
+    def _rotate_if_needed(self) -> None:
+        if not os.path.exists(self.path):
+            self._opened_at = time.time()
+            return
+        if os.path.getsize(self.path) < self.max_bytes and time.time() - self._opened_at < self.max_age:
+            return
+        os.replace(self.path, self._rotated_path())
+        self._opened_at = time.time()
+
+    def _flush(self, rows: List[Dict[str, str]]) -> None:
+        if not rows:
+            return
+        self._rotate_if_needed()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+
+    def _run(self) -> None:
+        while not self._stopped.is_set() or not self._queue.empty():
+            try:
+                self._flush(self._drain())
+            except OSError as e:
+                print(f"An error occurred while writing logs: {e}")
+
+    def close(self) -> None:
+        # Flush whatever is still queued before the process exits
+        self._stopped.set()
+        self._thread.join(timeout=5)
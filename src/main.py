@@ -1,59 +1,23 @@
 import streamlit as st
-from vector_store import VectorStore
-from trip_planner import TripPlanner
-from weather_service import WeatherService
-from accommodation_service import AccommodationService
-from langchain_google_genai import ChatGoogleGenerativeAI
-import os
-import csv
-from dotenv import load_dotenv
-from typing import Tuple, Dict, Optional
-
-# Load environment variables
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-OPEN_WEATHER_MAP_KEY = os.getenv("OPEN_WEATHER_MAP_KEY")
-SKY_SCANNER_KEY = os.getenv("SKY_SCANNER_KEY")
-
-# Function to log data to a CSV file
-def log_to_csv(data: Dict[str, str], filename='logs.csv') -> None:
-    file_exists = os.path.isfile(filename)
-    with open(filename, mode='a', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=data.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(data)
-
-# Function to extract location and date from the query using the LLM
-def extract_location_and_date(query: str, llm: ChatGoogleGenerativeAI) -> Tuple[Optional[str], Optional[str]]:
-    location_prompt = f"Extract the location from this query: '{query}'"
-    date_prompt = (
-        f"Extract and convert the date from the following query: '{query}'. "
-        "If the year is not provided, assume it is 2024. Return the date in the format 'YYYY-MM-DD'."
-    )
-
-    location_response = llm.invoke(input=[{"role": "user", "content": location_prompt}])
-    location = location_response.content.strip()
-
-    # Check if the extracted location is valid and not empty
-    if not location or "The provided query" in location:
-        location = None
-
-    date_response = llm.invoke(input=[{"role": "user", "content": date_prompt}])
-    date = date_response.content.strip()
-
-    return location, date
+from resources import get_trip_service, warm_up
+from service import observe_request, plan_header
+from metrics import profile_if_slow
+import time
+from typing import Dict
 
 # Main function to run the Streamlit app
 def main() -> None:
     st.title("🌍 AI Powered Trip Planner")
     
-    # Initialize services
-    weather_service = WeatherService(api_key = OPEN_WEATHER_MAP_KEY)
-    accommodation_service = AccommodationService(api_key = SKY_SCANNER_KEY)
-    trip_planner = TripPlanner(weather_service, accommodation_service)
-    vector_store = VectorStore(dimension=384)  # Initialize with the correct dimension
-    llm = ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=GOOGLE_API_KEY, temperature=0.7, top_p=0.9)
+    # Shared services are created once per process and reused across reruns and sessions
+    warm_up()
+    service = get_trip_service()
+
+    # Optional ?user=<id> query parameter scopes saved favourites to one user
+    user_id = st.query_params.get("user")
+
+    # Skip the plan cache and always generate a new plan
+    force_refresh = st.sidebar.checkbox("Always generate a fresh plan", value=False)
 
     st.write("Welcome! Ask me to plan a trip or retrieve a saved plan.")
 
@@ -80,122 +44,34 @@ def main() -> None:
 
         # Analyze the user query and generate a response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                analyze_query_prompt = f"Analyze the following user query to determine if they want to create a new trip plan or retrieve a saved plan: '{prompt}'. Respond with 'create' if they want to create a new trip plan, or 'retrieve' if they want to retrieve a saved plan."
-                query_analysis = llm.invoke(input=[{"role": "user", "content": analyze_query_prompt}])
-                action = query_analysis.content.strip().lower()
-
-                # Log the query analysis
-                log_to_csv({
-                    "Model Name": "gemini-pro",
-                    "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                    "User Input": prompt,
-                    "Full Prompt": analyze_query_prompt,
-                    "API Request": "",
-                    "API Response": query_analysis.content.strip()
-                })
-
-                if action == "create":
-                    location, date_range = extract_location_and_date(prompt, llm)
-                    if not location or not date_range:
-                        response = "Could not extract location or date. Please try again ❗"
-                    else:
-                        # Fetch weather and accommodation data
-                        weather_request = f"Requesting weather for {location} on {date_range}"
-                        accommodation_request = f"Requesting accommodation for {location} on {date_range}"
-                        weather_response = weather_service.get_forecast(location, date_range)
-                        accommodation_response = accommodation_service.get_hotels(location)
-
-                        # Log API requests and responses
-                        log_to_csv({
-                            "Model Name": "gemini-pro",
-                            "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                            "User Input": prompt,
-                            "Full Prompt": analyze_query_prompt,
-                            "API Request": weather_request,
-                            "API Response": str(weather_response)
-                        })
-                        log_to_csv({
-                            "Model Name": "gemini-pro",
-                            "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                            "User Input": prompt,
-                            "Full Prompt": analyze_query_prompt,
-                            "API Request": accommodation_request,
-                            "API Response": str(accommodation_response)
-                        })
-
-                        # Generate the trip plan
-                        trip_plan = trip_planner.generate_plan(location, date_range)
-                        response = f"**Generated Trip Plan for {location} ({date_range}):**\n{trip_plan}"
-
-                        st.session_state["last_response"] = {
-                            "response": response,
-                            "trip_plan": trip_plan,
-                            "metadata": {"location": location, "date_range": date_range}
-                        }
-
-                        # Log the generated plan
-                        log_to_csv({
-                            "Model Name": "gemini-pro",
-                            "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                            "User Input": prompt,
-                            "Full Prompt": analyze_query_prompt,
-                            "API Request": "",
-                            "API Response": query_analysis.content.strip(),
-                            "Generated Plan": response,
-                            "Follow-up Question": "",
-                            "Favorite Saved": "No"
-                        })
-                        
-                elif action == "retrieve":
-                    location, _ = extract_location_and_date(prompt, llm)
-
-                    if not location:
-                        response = "No saved record found for this location in the database ❗"
-                    else:
-                        try:
-                            retrieved_trip_plan = vector_store.retrieve_trip_plan(location)
-                            response = f"**Retrieved Trip Plan for {location}:**\n{retrieved_trip_plan}"
-                        except IndexError:
-                            response = f"No matching trip plan found for {location}. Please try a different location."
-                            st.session_state["last_response"] = None  # Clear last response since retrieval failed
-
-                        # Log the retrieval attempt
-                        log_to_csv({
-                            "Model Name": "gemini-pro",
-                            "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                            "User Input": prompt,
-                            "Full Prompt": analyze_query_prompt,
-                            "API Request": "",
-                            "API Response": query_analysis.content.strip(),
-                            "Generated Plan": response,
-                            "Follow-up Question": "",
-                            "Favorite Saved": "No"
-                        })
-
+            with st.spinner("Thinking..."), profile_if_slow("chat_turn"):
+                request_started = time.perf_counter()
+                # One combined extraction (or a regex pre-pass) instead of three sequential LLM calls
+                query_analysis = service.analyze(prompt)
+                action = query_analysis["intent"]
+
+                streamed = False
+                if action == "create" and query_analysis["location"] and query_analysis["date"]:
+                    # Stream the plan: each data section appears as it arrives, then the journey token by token
+                    result: Dict = {}
+                    st.markdown(plan_header(query_analysis["location"], query_analysis["date"]))
+                    st.write_stream(service.stream_create(prompt, query_analysis, result, user_id=user_id, force_refresh=force_refresh))
+                    streamed = True
+                    st.session_state["last_response"] = result
                 else:
-                    response = "Unable to determine the action from the query. Please try again."
-                    st.session_state["last_response"] = {
-                        "response": response,
-                        "trip_plan": None
-                    }
+                    result = service.respond(prompt, query_analysis, user_id=user_id)
+                    if action == "retrieve":
+                        st.session_state["last_response"] = None  # Retrieved plans are already saved
+                    elif action != "create":
+                        st.session_state["last_response"] = result
 
-                    # Log the response when action is undetermined
-                    log_to_csv({
-                        "Model Name": "gemini-pro",
-                        "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                        "User Input": prompt,
-                        "Full Prompt": analyze_query_prompt,
-                        "API Request": "",
-                        "API Response": query_analysis.content.strip(),
-                        "Generated Plan": response,
-                        "Follow-up Question": "",
-                        "Favorite Saved": "No"
-                    })
+                observe_request(action, time.perf_counter() - request_started)
+                response = result["response"]
 
                 # Only add to chat history if there is a valid response
                 if response:
-                    st.write(response)
+                    if not streamed:
+                        st.write(response)
                     st.session_state.messages.append({"role": "assistant", "content": response})
 
     # Display Like/Dislike buttons at the bottom of the response
@@ -203,38 +79,12 @@ def main() -> None:
         col1, col2 = st.columns(2)
         with col1:
             if st.button("👍 Like"):
-                vector_store.add_plan(
-                    st.session_state["last_response"]["trip_plan"],
-                    metadata=st.session_state["last_response"]["metadata"]
-                )
+                service.save_favorite(st.session_state["last_response"]["trip_plan"], st.session_state["last_response"]["metadata"])
                 st.session_state["last_action"] = "✔ Trip plan saved to your favorites!"
-                # Log the favorite saved status
-                log_to_csv({
-                    "Model Name": "gemini-pro",
-                    "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                    "User Input": st.session_state["last_response"]["metadata"],
-                    "Full Prompt": "",
-                    "API Request": "",
-                    "API Response": "",
-                    "Generated Plan": st.session_state["last_response"]["trip_plan"],
-                    "Follow-up Question": "",
-                    "Favorite Saved": "Yes"
-                })
         with col2:
             if st.button("👎 Dislike"):
                 st.session_state["last_action"] = "✖ Trip plan not saved."
-                # Log the dislike status
-                log_to_csv({
-                    "Model Name": "gemini-pro",
-                    "LLM Hyperparameters": "temperature=0.7, top_p=0.9",
-                    "User Input": st.session_state["last_response"]["metadata"],
-                    "Full Prompt": "",
-                    "API Request": "",
-                    "API Response": "",
-                    "Generated Plan": st.session_state["last_response"]["trip_plan"],
-                    "Follow-up Question": "",
-                    "Favorite Saved": "No"
-                })
+                service.record_dislike(st.session_state["last_response"]["trip_plan"], st.session_state["last_response"]["metadata"])
 
     # Show the last action message if available
     if st.session_state["last_action"]:
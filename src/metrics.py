@@ -0,0 +1,169 @@
+import cProfile
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Histogram bucket bounds (seconds) for per-stage latency
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# Recent samples kept per stage for percentile estimates
+RESERVOIR_SIZE = 2048
+
+PREFIX = "trip_planner"
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: Deque[float] = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def percentile(self, quantile: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+_lock = threading.Lock()
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+# Pull-based counters, e.g. cache hit/miss totals kept by the caches themselves
+_sources: List[Tuple[str, str, Callable[[], Dict[str, float]]]] = []
+
+def observe(stage: str, seconds: float) -> None:
+    with _lock:
+        if stage not in _histograms:
+            _histograms[stage] = Histogram()
+        _histograms[stage].observe(seconds)
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def register_source(name: str, label: str, collect: Callable[[], Dict[str, float]]) -> None:
+    # `collect` returns {label value: counter value} and is called on every scrape
+    with _lock:
+        _sources.append((name, label, collect))
+
+def percentiles(stage: str) -> Dict[float, float]:
+    with _lock:
+        histogram = _histograms.get(stage)
+        return {quantile: histogram.percentile(quantile) if histogram else 0.0 for quantile in QUANTILES}
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+def render_prometheus() -> str:
+    # Prometheus text exposition format
+    lines: List[str] = []
+    with _lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+        sources = list(_sources)
+
+        lines.append(f"# HELP {PREFIX}_stage_seconds Latency of each request pipeline stage.")
+        lines.append(f"# TYPE {PREFIX}_stage_seconds histogram")
+        for stage, histogram in sorted(histograms.items()):
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append(f"# HELP {PREFIX}_stage_latency_seconds Recent per-stage latency percentiles.")
+        lines.append(f"# TYPE {PREFIX}_stage_latency_seconds summary")
+        for stage, histogram in sorted(histograms.items()):
+            for quantile in QUANTILES:
+                lines.append(f'{PREFIX}_stage_latency_seconds{{stage="{stage}",quantile="{quantile}"}} {histogram.percentile(quantile)}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+    declared = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in declared:
+            lines.append(f"# TYPE {PREFIX}_{name} counter")
+            declared.add(name)
+        lines.append(f"{PREFIX}_{name}{_format_labels(labels)} {value}")
+    for name, label, collect in sources:
+        if name not in declared:
+            lines.append(f"# TYPE {PREFIX}_{name} counter")
+            declared.add(name)
+        for label_value, value in collect().items():
+            lines.append(f'{PREFIX}_{name}{{{label}="{label_value}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep scrapes out of the app's stdout
+        pass
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+@contextmanager
+def profile_if_slow(name: str, threshold: Optional[float] = None, directory: str = "profiles") -> Iterator[None]:
+    # Profiles the block and keeps the cProfile dump only if it took longer than `threshold` seconds
+    if threshold is None:
+        threshold_env = os.getenv("PROFILE_SLOW_SECONDS")
+        threshold = float(threshold_env) if threshold_env else None
+    if threshold is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Only one profiler can be active at a time; concurrent slow requests go unprofiled
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        if elapsed >= threshold:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.prof")
+            profiler.dump_stats(path)
+            inc("slow_requests_total", stage=name)
+            print(f"Slow {name} request took {elapsed:.2f}s, profile saved to {path}")
@@ -0,0 +1,129 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import numpy as np
+from cache import TTLCache, normalize_location
+from weather_service import forecast_days
+
+PLAN_TTL = 6 * 60 * 60
+# Cosine similarity above which two location spellings share cached plans ("saudia arabia" / "Saudi Arabia")
+LOCATION_SIMILARITY = 0.85
+# Embeddings alone place "austria" next to "australia"; spellings must also be within one edit per this many
+# characters, and names shorter than MIN_FUZZY_LENGTH ("iran" / "iraq") must match exactly
+CHARS_PER_EDIT = 8
+MIN_FUZZY_LENGTH = 5
+
+# Keyword -> coarse condition, checked in order against the forecast description
+CONDITIONS = (
+    ("thunder", "storm"),
+    ("snow", "snow"),
+    ("sleet", "snow"),
+    ("rain", "rain"),
+    ("drizzle", "rain"),
+    ("cloud", "clouds"),
+    ("clear", "clear"),
+)
+
+def _day_bucket(day: Dict[str, Any]) -> str:
+    description = str(day.get("description", "")).lower()
+    condition = next((bucket for keyword, bucket in CONDITIONS if keyword in description), "other")
+    band = int(float(day["temperature"]) // 5 * 5)
+    return f"{band}c-{condition}"
+
+def weather_bucket(weather: Union[None, Dict[str, Any], List[Dict[str, Any]]]) -> str:
+    # Plans only differ meaningfully across broad weather changes: 5°C bands and a coarse condition per day
+    days = forecast_days(weather)
+    return ",".join(_day_bucket(day) for day in days) if days else "unknown"
+
+def _edit_distance(a: str, b: str) -> int:
+    # Optimal string alignment distance: insertions, deletions, substitutions and adjacent transpositions
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+def similar_spelling(a: str, b: str) -> bool:
+    # Typos only: the same words with the same first letters, a few edits apart ("saudia arabia" / "saudi arabia"),
+    # but not neighbouring places ("north korea" / "south korea", "gambia" / "zambia")
+    if a == b:
+        return True
+    words_a, words_b = a.split(), b.split()
+    if len(words_a) != len(words_b) or any(x[0] != y[0] for x, y in zip(words_a, words_b)):
+        return False
+    shorter = min(len(a), len(b))
+    return shorter >= MIN_FUZZY_LENGTH and _edit_distance(a, b) <= max(1, shorter // CHARS_PER_EDIT)
+
+class PlanCache:
+    # Caches generated plans keyed on (canonical location, date, weather bucket)
+    def __init__(self, encode: Callable[[str], np.ndarray], ttl: float = PLAN_TTL, maxsize: int = 512,
+                 similarity: float = LOCATION_SIMILARITY, max_locations: int = 4096):
+        self.encode = encode  # Usually the vector store's embedding cache, so no extra model is loaded
+        self.similarity = similarity
+        self.max_locations = max_locations
+        self._plans = TTLCache(ttl, maxsize=maxsize)
+        self._places = TTLCache(ttl, maxsize=maxsize)  # "location|date" prefixes of cached keys
+        self._locations: Dict[str, np.ndarray] = {}  # canonical location -> unit embedding
+        self._aliases: Dict[str, str] = {}  # normalized spelling -> canonical location
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        return self._plans.hits
+
+    @property
+    def misses(self) -> int:
+        return self._plans.misses
+
+    def canonical_location(self, location: str) -> str:
+        normalized = normalize_location(location)
+        with self._lock:
+            if normalized in self._aliases:
+                return self._aliases[normalized]
+
+        embedding = np.asarray(self.encode(normalized), dtype=np.float32)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+
+        with self._lock:
+            canonical = normalized
+            if self._locations:
+                names = list(self._locations)
+                scores = np.stack([self._locations[name] for name in names]) @ embedding
+                # The closest spelling that is both semantically near and a plausible typo
+                for best in np.argsort(-scores):
+                    if scores[best] < self.similarity:
+                        break
+                    if similar_spelling(normalized, names[best]):
+                        canonical = names[best]
+                        break
+            if canonical == normalized and len(self._locations) < self.max_locations:
+                self._locations[normalized] = embedding
+            if len(self._aliases) >= 4 * self.max_locations:
+                self._aliases.clear()
+            self._aliases[normalized] = canonical
+            return canonical
+
+    def _place(self, location: str, date: str) -> str:
+        return f"{self.canonical_location(location)}|{date}"
+
+    def key(self, location: str, date: str, weather: Union[None, Dict[str, Any], List[Dict[str, Any]]]) -> str:
+        return f"{self._place(location, date)}|{weather_bucket(weather)}"
+
+    def may_have(self, location: str, date: str) -> bool:
+        # False when no plan for this place and date is cached under any weather, so a lookup cannot hit
+        return self._places.get(self._place(location, date)) is not None
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return self._plans.get(key)
+
+    def set(self, key: str, trip_plan: str, trip_data: Dict[str, Any]) -> None:
+        self._plans.set(key, (trip_plan, trip_data))
+        self._places.set(key.rsplit("|", 1)[0], True)
+
+    def clear(self) -> None:
+        self._plans.clear()
+        self._places.clear()
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from langchain.prompts import PromptTemplate
+
+# Resolved from this file rather than the working directory, so any entry point finds the prompts
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+# Seconds between mtime checks; a stat per call is cheap, but not free under load
+CHECK_INTERVAL = 1.0
+
+class _Entry:
+    def __init__(self, path: str, input_variables: Tuple[str, ...], preamble: str):
+        self.path = path
+        self.input_variables = input_variables
+        self.preamble = preamble
+        self.template: Optional[PromptTemplate] = None
+        self.mtime = 0.0
+        self.checked_at = 0.0
+
+class PromptRegistry:
+    # Loads markdown prompt templates once, validates their variables and reloads them when the file changes
+    def __init__(self, directory: str = PROMPTS_DIR, check_interval: float = CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, filename: str, input_variables: Iterable[str], preamble: str = "") -> PromptTemplate:
+        # Fails fast on a missing file or mismatched variables
+        entry = _Entry(os.path.join(self.directory, filename), tuple(sorted(input_variables)), preamble)
+        with self._lock:
+            self._load(entry)
+            self._entries[name] = entry
+        return entry.template
+
+    def _load(self, entry: _Entry) -> None:
+        mtime = os.path.getmtime(entry.path)
+        with open(entry.path, "r", encoding="utf-8") as f:
+            template = PromptTemplate.from_template(entry.preamble + f.read())
+        if tuple(sorted(template.input_variables)) != entry.input_variables:
+            raise ValueError(f"{entry.path} uses variables {sorted(template.input_variables)}, expected {list(entry.input_variables)}")
+        entry.template = template
+        entry.mtime = mtime
+        entry.checked_at = time.monotonic()
+
+    def get(self, name: str) -> PromptTemplate:
+        entry = self._entries[name]
+        if time.monotonic() - entry.checked_at < self.check_interval:
+            return entry.template
+
+        with self._lock:
+            if time.monotonic() - entry.checked_at >= self.check_interval:
+                entry.checked_at = time.monotonic()
+                try:
+                    if os.path.getmtime(entry.path) != entry.mtime:
+                        self._load(entry)
+                except (OSError, ValueError) as e:
+                    # A broken edit keeps the last good template in service
+                    print(f"Could not reload prompt {name}: {e}")
+            return entry.template
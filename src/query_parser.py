@@ -0,0 +1,156 @@
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+# Year assumed when a query only mentions day and month (matches the original date prompt)
+DEFAULT_YEAR = 2024
+
+INTENTS = ("create", "retrieve")
+
+RETRIEVE_PATTERN = re.compile(r"\b(retrieve|saved|look up|lookup|show me my|find my|see my|open my)\b", re.IGNORECASE)
+CREATE_PATTERN = re.compile(r"\b(create|make|generate|build|organi[sz]e|prepare)\b", re.IGNORECASE)
+PLAN_PATTERN = re.compile(r"\bplan\b", re.IGNORECASE)
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+MONTHS = "january|february|march|april|may|june|july|august|september|october|november|december"
+DAY_MONTH_PATTERN = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({MONTHS})(?:,?\s+(\d{{4}}))?\b", re.IGNORECASE)
+MONTH_DAY_PATTERN = re.compile(rf"\b({MONTHS})\s+(\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(\d{{4}}))?\b", re.IGNORECASE)
+# A destination the fast path trusts: one or more capitalised words, matched case-sensitively
+PLACE = r"[A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*"
+# Anything after to/for/in/at that looks like a place; more than one means the query is ambiguous
+PLACE_CANDIDATE_PATTERN = re.compile(rf"\b(?:to|for|in|at)\s+({PLACE})")
+# The only shapes the fast path handles: "... plan ... to/for <Place> on <date>" and "... plan to/for <Place>"
+CREATE_SHAPE = re.compile(rf"\b[Pp]lan\b.*?\b(?:to|for)\s+(?P<place>{PLACE})\s+on\s+(?P<date>.+?)\s*[.!]?$", re.DOTALL)
+RETRIEVE_SHAPE = re.compile(rf"\b(?:[Pp]lan|[Tt]rip)\s+(?:to|for)\s+(?P<place>{PLACE})\s*[.!]?$")
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|never|don't|dont|do not|won't|instead)\b|\?", re.IGNORECASE)
+# Capitalised words that can follow "to"/"for" without being a destination
+NON_LOCATION_WORDS = {"a", "an", "the", "me", "my", "trip", "plan", "travel", "vacation", "holiday", "visit", "us", "tomorrow", "today",
+                      "next", "this", "two", "three", "business", "work", "weekend", "week"}
+
+EXTRACTION_PROMPT = (
+    "Analyze the following user query for a trip planner: '{query}'.\n"
+    "Return only a JSON object with these keys:\n"
+    "- \"intent\": \"create\" if they want to create a new trip plan, or \"retrieve\" if they want to retrieve a saved plan\n"
+    "- \"location\": the destination mentioned in the query, or null if there is none\n"
+    f"- \"date\": the trip date in the format 'YYYY-MM-DD' (if the year is not provided, assume it is {DEFAULT_YEAR}), or null if there is none"
+)
+
+def _parse_date(text: str) -> Optional[str]:
+    # Normalise the first recognisable date in the text to YYYY-MM-DD
+    try:
+        match = ISO_DATE_PATTERN.search(text)
+        if match:
+            year, month, day = (int(part) for part in match.groups())
+            return datetime(year, month, day).strftime('%Y-%m-%d')
+        match = DAY_MONTH_PATTERN.search(text)
+        if match:
+            day, month, year = match.groups()
+            return datetime.strptime(f"{year or DEFAULT_YEAR} {month} {day}", '%Y %B %d').strftime('%Y-%m-%d')
+        match = MONTH_DAY_PATTERN.search(text)
+        if match:
+            month, day, year = match.groups()
+            return datetime.strptime(f"{year or DEFAULT_YEAR} {month} {day}", '%Y %B %d').strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+    return None
+
+def _place_candidates(query: str) -> set:
+    return {match.group(1) for match in PLACE_CANDIDATE_PATTERN.finditer(query)}
+
+def _is_place(candidate: str) -> bool:
+    words = candidate.lower().split()
+    return bool(words) and not any(word in NON_LOCATION_WORDS or re.fullmatch(MONTHS, word) for word in words)
+
+def quick_extract(query: str) -> Optional[Dict[str, Any]]:
+    # Cheap regex pre-pass for the narrow, unambiguous shapes; anything else returns None and goes to the LLM
+    query = query.strip()
+    if NEGATION_PATTERN.search(query):
+        return None
+    retrieve = bool(RETRIEVE_PATTERN.search(query))
+    create = bool(CREATE_PATTERN.search(query)) or bool(PLAN_PATTERN.search(query))
+    if retrieve and CREATE_PATTERN.search(query):
+        return None
+    if not retrieve and not create:
+        return None
+
+    # Exactly one place-like phrase, or the destination is ambiguous
+    candidates = _place_candidates(query)
+    if len(candidates) != 1:
+        return None
+
+    if retrieve:
+        match = RETRIEVE_SHAPE.search(query)
+        if not match or not _is_place(match.group("place")):
+            return None
+        return {"intent": "retrieve", "location": match.group("place"), "date": _parse_date(query)}
+
+    match = CREATE_SHAPE.search(query)
+    if not match or not _is_place(match.group("place")):
+        return None
+    date = _parse_date(match.group("date"))
+    if not date:
+        return None
+    return {"intent": "create", "location": match.group("place"), "date": date}
+
+def _parse_extraction(content: str) -> Optional[Dict[str, Any]]:
+    # Validate the JSON returned by the combined extraction call
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    intent = str(data.get("intent") or "").strip().lower()
+    if intent not in INTENTS:
+        return None
+    location = data.get("location")
+    location = location.strip() if isinstance(location, str) and location.strip() else None
+    date = data.get("date")
+    date = _parse_date(date) if isinstance(date, str) else None
+    return {"intent": intent, "location": location, "date": date}
+
+# Function to extract location and date from the query using the LLM
+def extract_location_and_date(query: str, llm: ChatGoogleGenerativeAI) -> Tuple[Optional[str], Optional[str]]:
+    location_prompt = f"Extract the location from this query: '{query}'"
+    date_prompt = (
+        f"Extract and convert the date from the following query: '{query}'. "
+        f"If the year is not provided, assume it is {DEFAULT_YEAR}. Return the date in the format 'YYYY-MM-DD'."
+    )
+
+    location_response = llm.invoke(input=[{"role": "user", "content": location_prompt}])
+    location = location_response.content.strip()
+
+    # Check if the extracted location is valid and not empty
+    if not location or "The provided query" in location:
+        location = None
+
+    date_response = llm.invoke(input=[{"role": "user", "content": date_prompt}])
+    date = date_response.content.strip()
+
+    return location, date
+
+def analyze_query(query: str, llm: ChatGoogleGenerativeAI) -> Dict[str, Any]:
+    # Returns intent, location and date plus the prompt/response pair used, for logging
+    result = quick_extract(query)
+    if result:
+        return {**result, "prompt": "", "response": json.dumps(result), "source": "regex"}
+
+    prompt = EXTRACTION_PROMPT.format(query=query)
+    response = llm.invoke(input=[{"role": "user", "content": prompt}])
+    result = _parse_extraction(response.content)
+    if result:
+        return {**result, "prompt": prompt, "response": response.content.strip(), "source": "llm"}
+
+    # Fall back to the original intent call followed by separate location/date calls
+    prompt = f"Analyze the following user query to determine if they want to create a new trip plan or retrieve a saved plan: '{query}'. Respond with 'create' if they want to create a new trip plan, or 'retrieve' if they want to retrieve a saved plan."
+    response = llm.invoke(input=[{"role": "user", "content": prompt}])
+    intent = response.content.strip().lower()
+    location, date = (None, None)
+    if intent in INTENTS:
+        location, date = extract_location_and_date(query, llm)
+    return {"intent": intent, "location": location, "date": date, "prompt": prompt, "response": response.content.strip(), "source": "fallback"}
@@ -0,0 +1,121 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Tuple
+from dotenv import load_dotenv
+from langchain_google_genai import ChatGoogleGenerativeAI
+from sentence_transformers import SentenceTransformer
+from vector_store import VectorStore
+from embedding_cache import EmbeddingCache
+from trip_planner import LLM_MAX_RETRIES, LLM_TIMEOUT, TripPlanner
+from weather_service import WeatherService
+from accommodation_service import AccommodationService
+from cache import FORECAST_TTL, HOTELS_TTL, get_cache
+from http_client import HttpClient
+from log_writer import LogWriter
+from metrics import register_source, start_metrics_server
+from plan_cache import PlanCache
+from service import TripService
+
+# Load environment variables
+load_dotenv()
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+OPEN_WEATHER_MAP_KEY = os.getenv("OPEN_WEATHER_MAP_KEY")
+SKY_SCANNER_KEY = os.getenv("SKY_SCANNER_KEY")
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH")  # Optional SQLite file for caches that survive restarts
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")  # Optional .npy file backing the embedding cache
+LOG_PATH = os.getenv("LOG_PATH", "logs.jsonl")
+METRICS_PORT = os.getenv("METRICS_PORT")  # Serves Prometheus metrics on http://127.0.0.1:<port>/metrics when set
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"  # Model producing 384-dimensional embeddings
+EMBEDDING_DIMENSION = 384
+
+# Process-wide registry; Streamlit re-executes main() on every rerun but imported modules persist
+_resources: Dict[str, Any] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+
+    # A lock per resource so a slow model load does not block unrelated lookups
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _resources:
+            _resources[name] = factory()
+        return _resources[name]
+
+def get_llm() -> ChatGoogleGenerativeAI:
+    return _get_or_create("llm", lambda: ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=GOOGLE_API_KEY, temperature=0.7, top_p=0.9,
+                                                                 timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES))
+
+def get_embedding_model() -> SentenceTransformer:
+    return _get_or_create("embedding_model", lambda: SentenceTransformer(EMBEDDING_MODEL_NAME))
+
+def get_embedding_cache() -> EmbeddingCache:
+    return _get_or_create("embedding_cache", lambda: EmbeddingCache(get_embedding_model(), store_path=EMBEDDING_CACHE_PATH))
+
+def get_vector_store() -> VectorStore:
+    return _get_or_create("vector_store", lambda: VectorStore(dimension=EMBEDDING_DIMENSION, model=get_embedding_model(), embedding_cache=get_embedding_cache()))
+
+def get_http_client() -> HttpClient:
+    # One pooled session shared by every external service
+    return _get_or_create("http_client", HttpClient)
+
+def get_log_writer() -> LogWriter:
+    return _get_or_create("log_writer", lambda: LogWriter(LOG_PATH))
+
+def get_weather_service() -> WeatherService:
+    return _get_or_create("weather_service", lambda: WeatherService(api_key=OPEN_WEATHER_MAP_KEY, cache=get_cache("forecast", FORECAST_TTL, sqlite_path=CACHE_DB_PATH), http=get_http_client()))
+
+def get_accommodation_service() -> AccommodationService:
+    return _get_or_create("accommodation_service", lambda: AccommodationService(api_key=SKY_SCANNER_KEY, cache=get_cache("hotels", HOTELS_TTL, sqlite_path=CACHE_DB_PATH), http=get_http_client()))
+
+def get_plan_cache() -> PlanCache:
+    # Location matching reuses the vector store's embedding cache; the model loads on first use
+    return _get_or_create("plan_cache", lambda: PlanCache(lambda text: get_embedding_cache().encode(text)))
+
+def get_trip_planner() -> TripPlanner:
+    return _get_or_create("trip_planner", lambda: TripPlanner(get_weather_service(), get_accommodation_service(), llm=get_llm(), plan_cache=get_plan_cache()))
+
+def get_trip_service() -> TripService:
+    return _get_or_create("trip_service", lambda: TripService(get_trip_planner(), get_llm(), get_vector_store, log=get_log_writer().write))
+
+# Cache name -> (registry entry, how to reach its cache)
+_CACHE_RESOURCES: Dict[str, Tuple[str, Callable[[Any], Any]]] = {
+    "forecast": ("weather_service", lambda service: service.cache),
+    "hotels": ("accommodation_service", lambda service: service.cache),
+    "embeddings": ("embedding_cache", lambda cache: cache),
+    "plans": ("plan_cache", lambda cache: cache),
+}
+
+def _cache_stats(attribute: str) -> Dict[str, float]:
+    # Only report caches that already exist; a scrape must not load the embedding model
+    stats: Dict[str, float] = {}
+    for name, (resource_name, get_cache_of) in _CACHE_RESOURCES.items():
+        resource = _resources.get(resource_name)
+        if resource is not None:
+            stats[name] = getattr(get_cache_of(resource), attribute)
+    return stats
+
+register_source("cache_hits_total", "cache", lambda: _cache_stats("hits"))
+register_source("cache_misses_total", "cache", lambda: _cache_stats("misses"))
+
+def warm_up(background: bool = True) -> None:
+    # Load the embedding model and FAISS index ahead of the first request
+    def load() -> None:
+        get_vector_store()
+        get_trip_planner()
+
+    with _registry_lock:
+        if "warm_up" in _resources:
+            return
+        _resources["warm_up"] = True
+        if METRICS_PORT:
+            _resources["metrics_server"] = start_metrics_server(int(METRICS_PORT))
+    if background:
+        threading.Thread(target=load, name="resources-warm-up", daemon=True).start()
+    else:
+        load()
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, Optional
+from langchain_google_genai import ChatGoogleGenerativeAI
+from cache import TTLCache, normalize_location
+from metrics import inc, observe, timed
+from query_parser import analyze_query
+from trip_planner import TripPlanner, is_complete
+from vector_store import VectorStore
+
+MODEL_NAME = "gemini-pro"
+LLM_HYPERPARAMETERS = "temperature=0.7, top_p=0.9"
+# How long fetched weather, hotels and overview are shared between requests for the same place and date
+TRIP_DATA_TTL = 10 * 60
+
+NO_LOCATION_OR_DATE = "Could not extract location or date. Please try again ❗"
+NO_SAVED_LOCATION = "No saved record found for this location in the database ❗"
+UNKNOWN_ACTION = "Unable to determine the action from the query. Please try again."
+
+def plan_header(location: str, date: str) -> str:
+    return f"**Generated Trip Plan for {location} ({date}):**"
+
+class TripService:
+    # The create/retrieve pipeline without any UI; used by the Streamlit app, the HTTP API and the batch CLI
+    def __init__(self, trip_planner: TripPlanner, llm: ChatGoogleGenerativeAI, vector_store: Callable[[], VectorStore],
+                 log: Optional[Callable[[Dict[str, Any]], None]] = None, trip_data_ttl: float = TRIP_DATA_TTL):
+        self.trip_planner = trip_planner
+        self.llm = llm
+        self.vector_store = vector_store  # Getter, so create-only callers never load the FAISS index and plan log
+        self.log = log or (lambda data: None)
+        self._trip_data = TTLCache(trip_data_ttl, maxsize=1024)
+        self._trip_data_lock = threading.Lock()
+
+    def _log(self, user_input: Any, prompt: str, api_request: str = "", api_response: str = "", **extra: str) -> None:
+        self.log({
+            "Model Name": MODEL_NAME,
+            "LLM Hyperparameters": LLM_HYPERPARAMETERS,
+            "User Input": user_input,
+            "Full Prompt": prompt,
+            "API Request": api_request,
+            "API Response": api_response,
+            **extra,
+        })
+
+    def _log_response(self, query: str, analysis: Dict[str, Any], response: str) -> None:
+        self._log(query, analysis["prompt"], api_response=analysis["response"],
+                  **{"Generated Plan": response, "Follow-up Question": "", "Favorite Saved": "No"})
+
+    @staticmethod
+    def _result(query: str, analysis: Dict[str, Any], response: str, trip_plan: Optional[str] = None,
+                metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "action": analysis["intent"],
+            "location": analysis["location"],
+            "date": analysis["date"],
+            "response": response,
+            "trip_plan": trip_plan,
+            "metadata": metadata,
+        }
+
+    def analyze(self, query: str) -> Dict[str, Any]:
+        with timed("analyze_query"):
+            analysis = analyze_query(query, self.llm)
+        inc("query_extractions_total", source=analysis["source"])
+        self._log(query, analysis["prompt"], api_response=analysis["response"])
+        return analysis
+
+    def trip_data(self, location: str, date: str, known: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Concurrent and repeated requests for the same place and date share one set of upstream fetches;
+        # `known` holds values this request already fetched, which are not requested again
+        key = f"{normalize_location(location)}|{date}"
+        with self._trip_data_lock:
+            future = self._trip_data.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._trip_data.set(key, future)
+        if owner:
+            try:
+                trip_data = self.trip_planner.gather_trip_data(location, date, known)
+                future.set_result(trip_data)
+            except Exception as e:
+                trip_data = None
+                future.set_exception(e)
+            # Callers already waiting share a degraded result, but later requests fetch again
+            if trip_data is None or not is_complete(trip_data):
+                with self._trip_data_lock:
+                    if self._trip_data.get(key) is future:
+                        self._trip_data.set(key, None)
+        # Each caller gets its own copy; generate_plan and the plan cache may hold on to it
+        return dict(future.result())
+
+    def _finish_create(self, query: str, analysis: Dict[str, Any], trip_plan: str, trip_data: Dict[str, Any],
+                       user_id: Optional[str]) -> Dict[str, Any]:
+        location, date = analysis["location"], analysis["date"]
+        self._log(query, analysis["prompt"], f"Requesting weather for {location} on {date}", str(trip_data.get("weather")))
+        self._log(query, analysis["prompt"], f"Requesting accommodation for {location} on {date}", str(trip_data.get("hotels")))
+        response = f"{plan_header(location, date)}\n{trip_plan}"
+        self._log_response(query, analysis, response)
+        return self._result(query, analysis, response, trip_plan, {"location": location, "date_range": date, "user_id": user_id})
+
+    def create(self, query: str, analysis: Dict[str, Any], user_id: Optional[str] = None, force_refresh: bool = False) -> Dict[str, Any]:
+        location, date = analysis["location"], analysis["date"]
+        if not location or not date:
+            return self._result(query, analysis, NO_LOCATION_OR_DATE)
+        # A plan cache hit needs no overview or hotel fetches; trip data is only gathered (and shared) on a miss
+        trip_plan, trip_data = self.trip_planner.plan(location, date, force_refresh=force_refresh, gather=self.trip_data)
+        return self._finish_create(query, analysis, trip_plan, trip_data, user_id)
+
+    def stream_create(self, query: str, analysis: Dict[str, Any], result: Dict[str, Any], user_id: Optional[str] = None,
+                      force_refresh: bool = False) -> Iterator[str]:
+        # Yields plan chunks as they are generated; `result` is filled in once the plan is complete
+        trip_data: Dict[str, Any] = {}
+        chunks = []
+        for chunk in self.trip_planner.stream_plan(analysis["location"], analysis["date"], trip_data, force_refresh=force_refresh):
+            chunks.append(chunk)
+            yield chunk
+        result.update(self._finish_create(query, analysis, "".join(chunks), trip_data, user_id))
+
+    def retrieve(self, query: str, analysis: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+        location = analysis["location"]
+        if not location:
+            return self._result(query, analysis, NO_SAVED_LOCATION)
+        try:
+            trip_plan = self.vector_store().retrieve_trip_plan(location, user_id=user_id)
+            response = f"**Retrieved Trip Plan for {location}:**\n{trip_plan}"
+        except IndexError:
+            response = f"No matching trip plan found for {location}. Please try a different location."
+        self._log_response(query, analysis, response)
+        return self._result(query, analysis, response)
+
+    def respond(self, query: str, analysis: Dict[str, Any], user_id: Optional[str] = None, force_refresh: bool = False) -> Dict[str, Any]:
+        if analysis["intent"] == "create":
+            return self.create(query, analysis, user_id=user_id, force_refresh=force_refresh)
+        if analysis["intent"] == "retrieve":
+            return self.retrieve(query, analysis, user_id=user_id)
+        self._log_response(query, analysis, UNKNOWN_ACTION)
+        return self._result(query, analysis, UNKNOWN_ACTION)
+
+    def handle(self, query: str, user_id: Optional[str] = None, force_refresh: bool = False) -> Dict[str, Any]:
+        started = time.perf_counter()
+        analysis = self.analyze(query)
+        result = self.respond(query, analysis, user_id=user_id, force_refresh=force_refresh)
+        observe_request(result["action"], time.perf_counter() - started)
+        return result
+
+    def save_favorite(self, trip_plan: str, metadata: Dict[str, Any]) -> int:
+        plan_id = self.vector_store().add_plan(trip_plan, metadata=metadata)
+        self._log(metadata, "", **{"Generated Plan": trip_plan, "Follow-up Question": "", "Favorite Saved": "Yes"})
+        return plan_id
+
+    def record_dislike(self, trip_plan: str, metadata: Dict[str, Any]) -> None:
+        self._log(metadata, "", **{"Generated Plan": trip_plan, "Follow-up Question": "", "Favorite Saved": "No"})
+
+def observe_request(action: str, seconds: float) -> None:
+    observe(f"{action if action in ('create', 'retrieve') else 'unknown'}_request", seconds)
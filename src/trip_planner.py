@@ -1,73 +1,319 @@
 import os
-from typing import Dict, Any, List
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
-from weather_service import WeatherService
+from weather_service import WeatherService, forecast_days
 from accommodation_service import AccommodationService
+from metrics import timed
+from plan_cache import PlanCache
+from prompt_registry import PromptRegistry
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Per-call timeouts (seconds) for the independent upstream fetches
+WEATHER_TIMEOUT = 10.0
+HOTELS_TIMEOUT = 10.0
+OVERVIEW_TIMEOUT = 20.0
+
+# Fallback text used when an upstream fetch fails or times out
+NO_WEATHER = "Weather forecast is not available for this date."
+NO_HOTELS = "No hotels available."
+
+# Client-side limits on each Gemini request, so a hung call gives its pool worker back
+LLM_TIMEOUT = 30.0
+LLM_MAX_RETRIES = 2
+
+# Shared pool for the fan-out; each plan submits three short-lived tasks
+_executor = ThreadPoolExecutor(max_workers=12, thread_name_prefix="trip-planner")
+# How often waits re-check queued or running fetches against their deadlines
+POLL_INTERVAL = 0.1
+# How long a fetch may sit in the pool's queue on top of its own timeout; if hung calls hold every
+# worker, plans degrade to partial results instead of blocking behind them
+MAX_QUEUE_WAIT = 5.0
+
+TIMEOUTS = {
+    "weather": WEATHER_TIMEOUT,
+    "hotels": HOTELS_TIMEOUT,
+    "location_overview": OVERVIEW_TIMEOUT,
+}
+
+class _Fetch:
+    # A submitted upstream call. Its timeout counts from when it starts running, so waiting behind other
+    # plans' fetches under load is not mistaken for a slow upstream, but queue time is bounded too
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def mark_started(self) -> None:
+        self.started_at = time.monotonic()
+
+    def remaining(self) -> float:
+        deadline = self.submitted_at + MAX_QUEUE_WAIT + self.timeout
+        if self.started_at is not None:
+            deadline = min(deadline, self.started_at + self.timeout)
+        return deadline - time.monotonic()
+
+def _format_weather(weather: Any) -> str:
+    # Accepts one day from get_forecast or a list of days from get_forecast_range
+    days = forecast_days(weather)
+    if not days:
+        return NO_WEATHER
+    return "\n".join(
+        f"On {day['date']} in {day['location']}, the temperature will be {day['temperature']}°C "
+        f"(between {day['temp_min']}°C and {day['temp_max']}°C) with {day['description']}."
+        for day in days
+    )
+
+# Prompt-size budget for hotel and POI names; prompt tokens drive both LLM latency and cost
+MAX_PROMPT_HOTELS = 12
+MAX_PROMPT_HOTELS_CHARS = 600
+
+def _trim_hotels(hotels: Optional[List[str]]) -> List[str]:
+    # get_hotels returns hotels interleaved with their POIs; keep the first distinct names within budget
+    trimmed: List[str] = []
+    seen = set()
+    used = 0
+    for hotel in hotels or []:
+        if not hotel or hotel in seen:
+            continue
+        if len(trimmed) >= MAX_PROMPT_HOTELS or used + len(hotel) > MAX_PROMPT_HOTELS_CHARS:
+            break
+        trimmed.append(hotel)
+        seen.add(hotel)
+        used += len(hotel) + 1
+    return trimmed
+
+def _format_hotels(hotels: Optional[List[str]]) -> str:
+    hotels = _trim_hotels(hotels)
+    if not hotels:
+        return NO_HOTELS
+    return "\n".join(hotels)
+
+def is_complete(trip_data: Dict[str, Any]) -> bool:
+    # Only data from three successful fetches is cached; degraded results are retried on the next request
+    return bool(forecast_days(trip_data.get("weather"))) and bool(trip_data.get("hotels")) and bool(trip_data.get("location_overview"))
+
+# Section headings streamed as soon as their data arrives
+SECTION_TITLES = {
+    "location_overview": "Overview",
+    "weather": "Weather Forecast",
+    "hotels": "Recommended Hotels",
+}
+
+PLAN_VARIABLES = ("location", "location_overview", "weather", "hotels")
+PLAN_PREAMBLE = "# Please follow the provided format and ensure the response is friendly and conversational. Ensure to keep same format for suggested journey. Also ensure not to include this line in response\n"
+# name -> (file in prompts/, input variables, instruction line prepended to the file)
+PROMPTS = {
+    "location_overview": ("location_overview_prompt.md", ("location",),
+                          "# Please ensure the response is friendly and conversational. Also ensure not to include this line in response\n"),
+    "trip_plan": ("trip_plan_prompt.md", PLAN_VARIABLES, PLAN_PREAMBLE),
+    "trip_journey": ("trip_journey_prompt.md", PLAN_VARIABLES, PLAN_PREAMBLE),
+}
+
 class TripPlanner:
-    def __init__(self, weather_service: WeatherService, accommodation_service: AccommodationService):
+    def __init__(self, weather_service: WeatherService, accommodation_service: AccommodationService, llm: Optional[ChatGoogleGenerativeAI] = None,
+                 plan_cache: Optional[PlanCache] = None, prompts: Optional[PromptRegistry] = None):
         self.weather_service = weather_service
         self.accommodation_service = accommodation_service
-        self.llm = ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=GOOGLE_API_KEY, temperature=0.7, top_p=0.9)
+        self.plan_cache = plan_cache
+        self.llm = llm or ChatGoogleGenerativeAI(model="gemini-pro", google_api_key=GOOGLE_API_KEY, temperature=0.7, top_p=0.9,
+                                                 timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES)
+        # Templates are compiled and validated once; a missing or broken prompt fails here, not mid-request
+        self.prompts = prompts or PromptRegistry()
+        for name, (filename, input_variables, preamble) in PROMPTS.items():
+            self.prompts.register(name, filename, input_variables, preamble)
+        self._chains: Dict[str, LLMChain] = {}
+
+    def _chain(self, name: str) -> LLMChain:
+        # Chains are reused across calls and rebuilt only when the registry reloads their template
+        template = self.prompts.get(name)
+        chain = self._chains.get(name)
+        if chain is None or chain.prompt is not template:
+            chain = LLMChain(llm=self.llm, prompt=template)
+            self._chains[name] = chain
+        return chain
     
     def generate_location_overview(self, location: str) -> str:
-        # Load the location overview prompt from markdown
-        with open('prompts/location_overview_prompt.md', 'r') as file:
-            location_overview_prompt = file.read()
-
-        location_overview_prompt = ("# Please ensure the response is friendly and conversational. Also ensure not to include this line in response\n" 
-                                    + location_overview_prompt)
-        # Create a prompt template
-        prompt_template = PromptTemplate(
-            input_variables=["location"],
-            template=location_overview_prompt,
-        )
+        return self._chain("location_overview").run(location=location)
+
+    @staticmethod
+    def _timed_call(fetch: _Fetch, function: Callable[..., Any], *args: Any) -> Any:
+        fetch.mark_started()
+        with timed(fetch.name):
+            return function(*args)
+
+    def _submit(self, name: str, function: Callable[..., Any], *args: Any) -> _Fetch:
+        fetch = _Fetch(name, TIMEOUTS[name])
+        fetch.future = _executor.submit(self._timed_call, fetch, function, *args)
+        return fetch
+
+    def _submit_fetches(self, location: str, date: str, skip: Iterable[str] = ()) -> Dict[str, _Fetch]:
+        # Weather, hotels and the overview are independent, so fetch them concurrently; `skip` names ones already known
+        calls = {
+            "weather": (self.weather_service.get_forecast, location, date),
+            "hotels": (self.accommodation_service.get_hotels, location),
+            "location_overview": (self.generate_location_overview, location),
+        }
+        return {name: self._submit(name, function, *args) for name, (function, *args) in calls.items() if name not in skip}
+
+    def _fetch_weather(self, location: str, date: str) -> Any:
+        return self._result(self._submit("weather", self.weather_service.get_forecast, location, date))
+
+    @staticmethod
+    def _result(fetch: _Fetch) -> Any:
+        # Partial-result policy: a failed or slow fetch yields None instead of failing the plan
+        try:
+            while not fetch.future.done():
+                remaining = fetch.remaining()
+                if remaining <= 0:
+                    raise FutureTimeoutError()
+                # The deadline tightens once the task starts running, so re-check it periodically
+                wait([fetch.future], timeout=min(remaining, POLL_INTERVAL))
+            return fetch.future.result()
+        except FutureTimeoutError:
+            print(f"Timed out fetching {fetch.name}")
+            fetch.future.cancel()
+        except Exception as e:
+            print(f"An error occurred while fetching {fetch.name}: {e}")
+        return None
+
+    def _collect(self, fetches: Dict[str, _Fetch]) -> Dict[str, Any]:
+        # Each deadline belongs to its own fetch, so waiting on one does not eat into another's budget
+        return {name: self._result(fetch) for name, fetch in fetches.items()}
+
+    def gather_trip_data(self, location: str, date: str, known: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # `known` holds values already fetched for this request (even failed ones, as None); they are not fetched again
+        known = dict(known or {})
+        return {**known, **self._collect(self._submit_fetches(location, date, skip=known))}
 
-        # Create the chain
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
+    def _cache_plan(self, cache_key: Optional[str], trip_plan: str, trip_data: Dict[str, Any]) -> None:
+        if cache_key is not None and is_complete(trip_data):
+            self.plan_cache.set(cache_key, trip_plan, dict(trip_data))
 
-        # Run the chain to generate the location overview
-        location_overview = chain.run(location=location)
-        
-        return location_overview
+    def _plan_key(self, location: str, date: str, weather: Any) -> Optional[str]:
+        return self.plan_cache.key(location, date, weather) if self.plan_cache is not None else None
 
-    def generate_plan(self, location: str, date: str) -> str:
-        def format_weather(weather: Dict[str, Any]) -> str:
-            return f"On {weather['date']} in {weather['location']}, the temperature will be {weather['temperature']}°C with {weather['description']}."
+    def _may_be_cached(self, location: str, date: str, force_refresh: bool) -> bool:
+        return self.plan_cache is not None and not force_refresh and self.plan_cache.may_have(location, date)
 
-        def format_hotels(hotels: List[str]) -> str:
-            return "\n".join(hotels)
-        
-        weather = self.weather_service.get_forecast(location, date)
-        hotels = self.accommodation_service.get_hotels(location)
-        location_overview = self.generate_location_overview(location)
+    def _lookup_plan(self, location: str, date: str, weather: Any) -> Tuple[Optional[str], Optional[Tuple[str, Dict[str, Any]]]]:
+        # Returns the plan cache key and any cached (plan, trip data)
+        key = self._plan_key(location, date, weather)
+        return key, self.plan_cache.get(key) if key is not None else None
 
-        formatted_weather = format_weather(weather)
-        formatted_hotels = format_hotels(hotels)
+    def stream_plan(self, location: str, date: str, trip_data: Optional[Dict[str, Any]] = None, force_refresh: bool = False) -> Iterator[str]:
+        # Yields markdown chunks: each data section as soon as it arrives, then the journey token by token.
+        # Pass a dict as trip_data to receive the fetched weather, hotels and overview.
+        trip_data = trip_data if trip_data is not None else {}
+        heading = f"## Trip Plan for {location}\n\n"
+        yield heading
 
-        # Load the trip plan prompt from markdown
-        with open('prompts/trip_plan_prompt.md', 'r') as file:
-            trip_plan_prompt = file.read()
+        known: Dict[str, Any] = {}
+        cache_key = None
+        # With no plan cached for this place and date, every section streams as soon as its data arrives.
+        # Otherwise the forecast decides first whether the cached plan fits, before hotels or the overview are fetched.
+        if self._may_be_cached(location, date, force_refresh):
+            known["weather"] = self._fetch_weather(location, date)
+            cache_key, cached = self._lookup_plan(location, date, known["weather"])
+            if cached:
+                trip_plan, cached_data = cached
+                trip_data.update(cached_data)
+                yield trip_plan[len(heading):] if trip_plan.startswith(heading) else trip_plan
+                return
 
-        # Add explicit instruction for human tone and format preservation at the start
-        trip_plan_prompt = ("# Please follow the provided format and ensure the response is friendly and conversational. Ensure to keep same format for suggested journey. Also ensure not to include this line in response\n" 
-                            + trip_plan_prompt)
+        chunks: List[str] = [heading]
+        for name, value in known.items():
+            trip_data[name] = value
+            chunks.append(self._section(name, value, location))
+            yield chunks[-1]
+        for chunk in self._stream_fresh_plan(location, self._submit_fetches(location, date, skip=known), trip_data):
+            chunks.append(chunk)
+            yield chunk
+        if cache_key is None:
+            cache_key = self._plan_key(location, date, trip_data.get("weather"))
+        self._cache_plan(cache_key, "".join(chunks), trip_data)
 
-        # Create a prompt template
-        prompt_template = PromptTemplate(
-            input_variables=["location", "location_overview", "weather", "hotels"],
-            template=trip_plan_prompt,
+    def _stream_fresh_plan(self, location: str, fetches: Dict[str, _Fetch], trip_data: Dict[str, Any]) -> Iterator[str]:
+        pending = {fetch.future: fetch for fetch in fetches.values()}
+        while pending:
+            done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                fetch = pending.pop(future)
+                trip_data[fetch.name] = self._result(fetch)
+                yield self._section(fetch.name, trip_data[fetch.name], location)
+            for future, fetch in list(pending.items()):
+                if fetch.remaining() <= 0:
+                    del pending[future]
+                    trip_data[fetch.name] = self._result(fetch)  # Reports the timeout and cancels it if still queued
+                    yield self._section(fetch.name, None, location)
+
+        prompt = self.prompts.get("trip_journey").format(
+            location=location,
+            location_overview=trip_data.get("location_overview") or location,
+            weather=_format_weather(trip_data.get("weather")),
+            hotels=_format_hotels(trip_data.get("hotels")),
         )
 
-        # Create the chain
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
+        with timed("trip_plan_llm_stream"):
+            for chunk in self.llm.stream(prompt):
+                if chunk.content:
+                    yield chunk.content
+
+    @classmethod
+    def _section(cls, name: str, value: Any, location: str) -> str:
+        return f"### {SECTION_TITLES[name]}:\n{cls._format_section(name, value, location)}\n\n"
+
+    @staticmethod
+    def _format_section(name: str, value: Any, location: str) -> str:
+        if name == "weather":
+            return _format_weather(value)
+        if name == "hotels":
+            hotels = _trim_hotels(value)
+            return "\n".join(f"- {hotel}" for hotel in hotels) if hotels else NO_HOTELS
+        return value or f"Welcome to {location}!"
+
+    def plan(self, location: str, date: str, force_refresh: bool = False,
+             gather: Optional[Callable[[str, str, Dict[str, Any]], Dict[str, Any]]] = None) -> Tuple[str, Dict[str, Any]]:
+        # Returns (plan, trip data). Near-identical requests (same place, day and weather) reuse a cached plan unless
+        # force_refresh is set. gather(location, date, known) fetches whatever `known` lacks; defaults to gather_trip_data
+        known: Dict[str, Any] = {}
+        cache_key = None
+        if self._may_be_cached(location, date, force_refresh):
+            # The cache key only needs the forecast; hotels and the overview are not fetched unless it misses
+            known["weather"] = self._fetch_weather(location, date)
+            cache_key, cached = self._lookup_plan(location, date, known["weather"])
+            if cached:
+                return cached[0], dict(cached[1])
+
+        # Only the final trip-plan call waits on all of the upstream data; a forecast that already failed is not refetched
+        trip_data = (gather or self.gather_trip_data)(location, date, known)
+        return self._write_plan(location, date, trip_data, cache_key), trip_data
+
+    def generate_plan(self, location: str, date: str, trip_data: Optional[Dict[str, Any]] = None, force_refresh: bool = False) -> str:
+        if trip_data is None:
+            return self.plan(location, date, force_refresh=force_refresh)[0]
+        cache_key, cached = None, None
+        if self._may_be_cached(location, date, force_refresh):
+            cache_key, cached = self._lookup_plan(location, date, trip_data.get("weather"))
+        return cached[0] if cached else self._write_plan(location, date, trip_data, cache_key)
+
+    def _write_plan(self, location: str, date: str, trip_data: Dict[str, Any], cache_key: Optional[str]) -> str:
+        # The cache key comes from the forecast already gathered, never from another weather request
+        if cache_key is None:
+            cache_key = self._plan_key(location, date, trip_data.get("weather"))
+
+        formatted_weather = _format_weather(trip_data.get("weather"))
+        formatted_hotels = _format_hotels(trip_data.get("hotels"))
+        location_overview = trip_data.get("location_overview") or location
 
-        # Run the chain
-        trip_plan = chain.run(location=location, location_overview=location_overview, weather=formatted_weather, hotels=formatted_hotels)
+        with timed("trip_plan_llm"):
+            trip_plan = self._chain("trip_plan").run(location=location, location_overview=location_overview, weather=formatted_weather, hotels=formatted_hotels)
 
+        self._cache_plan(cache_key, trip_plan, trip_data)
         return trip_plan
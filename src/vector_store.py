@@ -1,77 +1,619 @@
 import faiss
 import json
+import base64
+import hashlib
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import os
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional, Any, Set, Tuple, Iterable
+from cache import normalize_location
+from embedding_cache import EmbeddingCache
+from metrics import timed
+
+# Corpus sizes at which index_type="auto" switches to an approximate index
+HNSW_THRESHOLD = 10_000
+IVFPQ_THRESHOLD = 500_000
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# Metadata fields kept in the inverted index used to narrow searches
+FILTER_FIELDS = ("user_id", "location", "date_range")
+
+# Users with at least this many saved plans get a dedicated sub-index
+PARTITION_THRESHOLD = 5_000
+
+# HNSW cannot remove vectors, so a plan re-added after a delete (an update) goes in under a fresh FAISS ID:
+# this base plus the log position of its add record, which replays to the same ID on every load
+REMAPPED_ID_BASE = 1 << 40
+
+# Filtered searches over at most this many candidates are scored exactly instead of through the ANN graph,
+# which only checks the filter on the nodes it happens to visit
+EXACT_SEARCH_LIMIT = 2_048
+
+def content_hash(trip_plan: str) -> str:
+    # Whitespace differences do not make a plan distinct
+    return hashlib.sha256(" ".join(trip_plan.split()).encode("utf-8")).hexdigest()
+
+def resolve_index_type(index_type: str, size: int) -> str:
+    if index_type == "ivfpq" and size < HNSW_THRESHOLD:
+        # IVF-PQ needs a reasonably sized corpus to train on; stay exact until then
+        return "flat"
+    if index_type != "auto":
+        return index_type
+    if size >= IVFPQ_THRESHOLD:
+        return "ivfpq"
+    if size >= HNSW_THRESHOLD:
+        return "hnsw"
+    return "flat"
+
+def create_index(index_type: str, dimension: int, training_vectors: Optional[np.ndarray] = None) -> faiss.Index:
+    # Every index scores normalized vectors by inner product (cosine) and maps plan IDs to vectors
+    if index_type == "flat":
+        base = faiss.IndexFlatIP(dimension)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = 80
+        base.hnsw.efSearch = 64
+    elif index_type == "ivfpq":
+        size = 0 if training_vectors is None else len(training_vectors)
+        nlist = max(1, min(4096, int(4 * np.sqrt(size))))
+        quantizer = faiss.IndexFlatIP(dimension)
+        # 8-bit codes over 8-dimensional sub-vectors
+        base = faiss.IndexIVFPQ(quantizer, dimension, nlist, dimension // 8, 8, faiss.METRIC_INNER_PRODUCT)
+        base.train(training_vectors)
+        base.nprobe = min(nlist, 16)
+    else:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES} or 'auto'")
+    return faiss.IndexIDMap2(base)
 
 class VectorStore:
-    def __init__(self, dimension: int, index_path: str = "trip_plan_index.faiss", metadata_path: str = "trip_plan_metadata.json", threshold: float = 1.3):
+    def __init__(self, dimension: int, index_path: str = "trip_plan_index.faiss", metadata_path: str = "trip_plan_metadata.json", min_similarity: float = 0.35, model: Optional[SentenceTransformer] = None,
+                 log_path: str = "trip_plan_log.jsonl", checkpoint_every: int = 50, index_type: str = "auto", partition_threshold: int = PARTITION_THRESHOLD,
+                 embedding_cache: Optional[EmbeddingCache] = None):
         self.dimension: int = dimension
         self.index_path: str = index_path
-        self.metadata_path: str = metadata_path
-        self.threshold: float = threshold
-        self.model: SentenceTransformer = SentenceTransformer('all-MiniLM-L6-v2')  # Model producing 384-dimensional embeddings
-        
-        # Load or initialize the FAISS index
-        if os.path.exists(self.index_path):
-            self.index: faiss.Index = faiss.read_index(self.index_path)
-        else:
-            self.index: faiss.Index = faiss.IndexFlatL2(dimension)
-        
-        # Load or initialize metadata
-        if os.path.exists(self.metadata_path):
-            with open(self.metadata_path, "r") as f:
-                self.metadata: List[Dict] = json.load(f)
+        self.metadata_path: str = metadata_path  # Legacy full-metadata JSON, only read for migration
+        self.log_path: str = log_path  # Append-only log of plans and embeddings; the source of truth
+        self.legacy_checkpoint_path: str = f"{index_path}.checkpoint.json"  # Sidecar written by older versions
+        self.checkpoint_every: int = checkpoint_every
+        self.index_type: str = index_type
+        self.partition_threshold: int = partition_threshold
+        # Cosine similarity cut-off; 0.35 matches the old squared-L2 threshold of 1.3 on unit vectors
+        self.min_similarity: float = min_similarity
+        self.model: SentenceTransformer = model or SentenceTransformer('all-MiniLM-L6-v2')  # Model producing 384-dimensional embeddings
+        # Repeated queries and already-embedded plans skip the transformer forward pass
+        self.encoder: EmbeddingCache = embedding_cache or EmbeddingCache(self.model)
+        # The store is shared across Streamlit sessions; FAISS cannot search while the index is being
+        # modified, so reads and writes both take the lock (encoding happens outside it)
+        self._lock = threading.RLock()
+
+        self.index: faiss.Index = create_index("flat", dimension)
+        self.metadata: Dict[int, Dict] = {}
+        self._active_type: str = "flat"
+        self._log_entries: int = 0  # Records in the log
+        self._checkpoint_entries: int = 0  # Records covered by the last index checkpoint
+        self._deleted: Set[int] = set()  # Tombstoned FAISS IDs for indexes that cannot remove IDs (HNSW)
+        self._faiss_ids: Dict[int, int] = {}  # plan_id -> FAISS ID, only for plans re-added under a fresh ID
+        self._plan_ids: Dict[int, int] = {}  # The reverse of _faiss_ids
+        self._live_selector: Optional[Tuple[faiss.IDSelector, faiss.IDSelector]] = None  # Excludes _deleted; rebuilt lazily
+        self._next_id: int = 0
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FILTER_FIELDS}
+        self._partitions: Dict[str, faiss.Index] = {}  # user_id -> exact sub-index for large tenants
+        self._hashes: Dict[Tuple[Optional[str], str], int] = {}  # (user_id, content hash) -> plan_id
+
+        if not os.path.exists(self.log_path) and os.path.exists(self.metadata_path):
+            self._migrate_legacy()
+        self._load()
+
+    @staticmethod
+    def _encode_vector(embedding: np.ndarray) -> str:
+        return base64.b64encode(np.asarray(embedding, dtype=np.float32).tobytes()).decode("ascii")
+
+    def _decode_vector(self, data: str) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.array(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _read_log(self) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        if not os.path.exists(self.log_path):
+            return records
+        valid_bytes = 0
+        with open(self.log_path, "rb") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    # A line without its newline was never fully appended, even if it happens to parse
+                    if not line.endswith(b"\n"):
+                        raise ValueError("missing newline")
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash mid-append leaves at most one torn trailing line; anything earlier is corruption
+                    if f.read():
+                        raise ValueError(f"Corrupt record on line {line_number} of {self.log_path}")
+                    print(f"Dropping torn record at the end of {self.log_path}")
+                    break
+                # Records written before plan IDs existed are adds keyed by log position
+                record.setdefault("op", "add")
+                record.setdefault("id", len(records))
+                records.append(record)
+                valid_bytes += len(line)
+
+        # Truncate the torn tail so later appends start on a clean line
+        if valid_bytes < os.path.getsize(self.log_path):
+            with open(self.log_path, "rb+") as f:
+                f.truncate(valid_bytes)
+        return records
+
+    def _append_log(self, records: List[Dict[str, Any]]) -> None:
+        with open(self.log_path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_entries += len(records)
+
+    def _migrate_legacy(self) -> None:
+        # Convert the old index + metadata JSON pair into the append-only log
+        with open(self.metadata_path, "r") as f:
+            legacy_metadata: List[Dict] = json.load(f)
+
+        vectors: Optional[np.ndarray] = None
+        legacy_index = self._read_legacy_index()
+        if legacy_index is not None and legacy_index.ntotal == len(legacy_metadata):
+            vectors = legacy_index.reconstruct_n(0, legacy_index.ntotal)
+        if vectors is None:
+            vectors = np.array([
+                self.encoder.encode(f"{item['location']} {item['date_range']} {item['trip_plan']}", remember=False)
+                for item in legacy_metadata
+            ], dtype=np.float32).reshape(-1, self.dimension)
+
+        self._append_log([
+            {"op": "add", "id": plan_id, "metadata": item, "embedding": self._encode_vector(vector)}
+            for plan_id, (item, vector) in enumerate(zip(legacy_metadata, vectors))
+        ])
+
+    def _read_legacy_index(self) -> Optional[faiss.Index]:
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            return faiss.read_index(self.index_path)
+        except RuntimeError:
+            return None  # Already a combined checkpoint; the plans are re-encoded instead
+
+    @staticmethod
+    def _live_records(records: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        # Replay adds and deletes; an update is a delete followed by an add with the same ID
+        live: Dict[int, Dict[str, Any]] = {}
+        for record in records:
+            if record["op"] == "add":
+                live[record["id"]] = record
+            elif record["op"] == "delete":
+                live.pop(record["id"], None)
+        return live
+
+    def _read_checkpoint(self) -> Optional[Tuple[faiss.Index, Dict[str, Any]]]:
+        # One file: a JSON header line followed by the serialized index, so the two can never disagree
+        if not os.path.exists(self.index_path):
+            return None
+        with open(self.index_path, "rb") as f:
+            try:
+                checkpoint = json.loads(f.readline())
+            except (ValueError, UnicodeDecodeError):
+                return None  # A bare FAISS file from before the combined format
+            data = f.read()
+        # Checkpoints from before cosine scoring carry no metric and are rebuilt
+        if not isinstance(checkpoint, dict) or checkpoint.get("metric") != "ip" or checkpoint.get("index_type") not in INDEX_TYPES:
+            return None
+        index = faiss.deserialize_index(np.frombuffer(data, dtype=np.uint8))
+        if index.d != self.dimension:
+            return None
+        return index, checkpoint
+
+    def _load(self) -> None:
+        records = self._read_log()
+        live = self._live_records(records)
+        self.metadata = {plan_id: record["metadata"] for plan_id, record in live.items()}
+        self._log_entries = len(records)
+        self._next_id = max((record["id"] for record in records), default=-1) + 1
+
+        # Start from the checkpoint when it covers a prefix of the log, otherwise rebuild
+        checkpoint = self._read_checkpoint()
+        wanted_type = resolve_index_type(self.index_type, len(live))
+        if checkpoint and checkpoint[1]["index_type"] == wanted_type and 0 <= checkpoint[1]["entries"] <= len(records):
+            self.index, meta = checkpoint
+            self._active_type = meta["index_type"]
+            self._deleted = set(meta.get("deleted", []))
+            self._live_selector = None
+            self._faiss_ids = {plan_id: faiss_id for plan_id, faiss_id in meta.get("remapped", [])}
+            self._plan_ids = {faiss_id: plan_id for plan_id, faiss_id in self._faiss_ids.items()}
+            self._checkpoint_entries = meta["entries"]
+            for position, record in enumerate(records[self._checkpoint_entries:], start=self._checkpoint_entries):
+                if record["op"] == "add":
+                    self._index_add([record["id"]], self._decode_vector(record["embedding"]).reshape(1, -1), [position])
+                elif record["op"] == "delete":
+                    self._index_remove(record["id"])
         else:
-            self.metadata: List[Dict] = []
+            self._rebuild(live)
+            self._checkpoint_entries = 0
+
+        for plan_id, metadata in self.metadata.items():
+            self._index_metadata(plan_id, metadata)
+        self._build_partitions(live)
+
+        if self._checkpoint_entries < self._log_entries:
+            self.save()
+
+    @staticmethod
+    def _field_value(field: str, metadata: Dict) -> Optional[str]:
+        value = metadata.get(field)
+        if value is None:
+            return None
+        return normalize_location(value) if field == "location" else str(value)
+
+    @staticmethod
+    def _dedupe_key(metadata: Dict) -> Tuple[Optional[str], str]:
+        if "content_hash" not in metadata:
+            metadata["content_hash"] = content_hash(metadata.get("trip_plan", ""))
+        user_id = metadata.get("user_id")
+        return (None if user_id is None else str(user_id), metadata["content_hash"])
+
+    def _index_metadata(self, plan_id: int, metadata: Dict) -> None:
+        self._hashes[self._dedupe_key(metadata)] = plan_id
+        for field in FILTER_FIELDS:
+            value = self._field_value(field, metadata)
+            if value is not None:
+                self._postings[field].setdefault(value, set()).add(plan_id)
+
+    def _unindex_metadata(self, plan_id: int, metadata: Dict) -> None:
+        self._hashes.pop(self._dedupe_key(metadata), None)
+        for field in FILTER_FIELDS:
+            value = self._field_value(field, metadata)
+            postings = self._postings[field].get(value)
+            if postings is not None:
+                postings.discard(plan_id)
+                if not postings:
+                    del self._postings[field][value]
+
+    def _build_partitions(self, live: Dict[int, Dict[str, Any]], user_ids: Optional[List[str]] = None) -> None:
+        # Exact per-user sub-indexes keep filtered recall high for tenants with many plans
+        if user_ids is None:
+            user_ids = [user_id for user_id, plan_ids in self._postings["user_id"].items() if len(plan_ids) >= self.partition_threshold]
+            self._partitions = {}
+        for user_id in user_ids:
+            plan_ids = [plan_id for plan_id in self._postings["user_id"].get(user_id, ()) if plan_id in live]
+            vectors = np.array([self._decode_vector(live[plan_id]["embedding"]) for plan_id in plan_ids], dtype=np.float32).reshape(-1, self.dimension)
+            partition = create_index("flat", self.dimension)
+            if plan_ids:
+                partition.add_with_ids(self._normalize(vectors), np.array(plan_ids, dtype=np.int64))
+            self._partitions[user_id] = partition
+
+    def _rebuild(self, live: Dict[int, Dict[str, Any]]) -> None:
+        ids = np.array(list(live.keys()), dtype=np.int64)
+        vectors = np.array([self._decode_vector(record["embedding"]) for record in live.values()], dtype=np.float32).reshape(-1, self.dimension)
+        vectors = self._normalize(vectors)
+
+        self._active_type = resolve_index_type(self.index_type, len(ids))
+        self.index = create_index(self._active_type, self.dimension, vectors)
+        self._deleted = set()
+        self._live_selector = None
+        self._faiss_ids = {}
+        self._plan_ids = {}
+        if len(ids):
+            self.index.add_with_ids(vectors, ids)
+
+    def _faiss_id(self, plan_id: int) -> int:
+        return self._faiss_ids.get(plan_id, plan_id)
+
+    def _index_add(self, ids: List[int], vectors: np.ndarray, positions: Iterable[int]) -> None:
+        # positions are the log positions of the add records
+        vectors = self._normalize(vectors)
+        for plan_id, position in zip(ids, positions):
+            old_id = self._faiss_id(plan_id)
+            if old_id in self._deleted:
+                # HNSW still holds the old vector under the tombstoned ID; re-adding that ID would bring it back
+                self._plan_ids.pop(old_id, None)
+                self._faiss_ids[plan_id] = REMAPPED_ID_BASE + position
+                self._plan_ids[REMAPPED_ID_BASE + position] = plan_id
+        self.index.add_with_ids(vectors, np.array([self._faiss_id(plan_id) for plan_id in ids], dtype=np.int64))
+
+        for plan_id, vector in zip(ids, vectors):
+            partition = self._partitions.get(self.metadata.get(plan_id, {}).get("user_id"))
+            if partition is not None:
+                partition.add_with_ids(vector.reshape(1, -1), np.array([plan_id], dtype=np.int64))
+
+    def _index_remove(self, plan_id: int) -> None:
+        faiss_id = self._faiss_id(plan_id)
+        try:
+            self.index.remove_ids(np.array([faiss_id], dtype=np.int64))
+        except RuntimeError:
+            # HNSW cannot remove vectors; filter them at query time until the next rebuild
+            self._deleted.add(faiss_id)
+            self._live_selector = None
+
+        partition = self._partitions.get(self.metadata.get(plan_id, {}).get("user_id"))
+        if partition is not None:
+            partition.remove_ids(np.array([plan_id], dtype=np.int64))
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        # Write to a temporary file and rename so a crash never leaves a half-written checkpoint
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
 
     def save(self) -> None:
-        # Save the FAISS index to disk
-        faiss.write_index(self.index, self.index_path)
-        
-        # Save the metadata to disk
-        with open(self.metadata_path, "w") as f:
-            json.dump(self.metadata, f)
-
-    def add_plan(self, trip_plan: str, metadata: Dict) -> None:
-        # Generate the embedding for the trip plan
-        embedding: np.ndarray = self.model.encode(f"{metadata['location']} {metadata['date_range']} {trip_plan}")
-        print(f"Embedding shape: {embedding.shape}")
-
-        if embedding.shape[0] != self.dimension:
-            raise ValueError(f"Embedding dimension {embedding.shape[0]} does not match index dimension {self.dimension}")
-        
-        self.index.add(np.array([embedding]))  # Add embedding to FAISS index
-        
-        # Ensure the trip plan is included in the metadata
-        metadata['trip_plan'] = trip_plan
-        self.metadata.append(metadata)
-
-        # Save the index and metadata
-        self.save()
-
-    def search_plan(self, query: str, top_k: int = 1) -> List[Dict]:
-        query_embedding: np.ndarray = self.model.encode(query).reshape(1, -1)
-        distances: np.ndarray
-        indices: np.ndarray
-        distances, indices = self.index.search(query_embedding, top_k)
-        return [self.metadata[i] for i in indices[0]]
-    
-    def retrieve_trip_plan(self, location: str) -> str:
-        query_embedding: np.ndarray = self.model.encode(f"{location}").reshape(1, -1)
-        distances: np.ndarray
-        indices: np.ndarray
-        distances, indices = self.index.search(query_embedding, k=1)
-
-        # Debugging output to check what's being returned
-        print(f"Distances: {distances}")
-        print(f"Indices: {indices}")
-
-        # Check if the closest match is within the acceptable threshold
-        if indices[0][0] >= 0 and distances[0][0] < self.threshold:
-            return self.metadata[indices[0][0]]['trip_plan']
+        with self._lock:
+            # Switch index type or compact tombstones when the corpus has outgrown the current index
+            wanted_type = resolve_index_type(self.index_type, len(self.metadata))
+            if wanted_type != self._active_type or len(self._deleted) > max(100, len(self.metadata) // 10):
+                live = self._live_records(self._read_log())
+                self._rebuild(live)
+                self._build_partitions(live)
+
+            # Checkpoint the FAISS index together with the log position it covers; the log already holds every plan
+            header = json.dumps({
+                "entries": self._log_entries,
+                "index_type": self._active_type,
+                "metric": "ip",
+                "deleted": sorted(self._deleted),
+                "remapped": sorted(self._faiss_ids.items()),
+            })
+            self._write_atomic(self.index_path, header.encode("utf-8") + b"\n" + faiss.serialize_index(self.index).tobytes())
+            self._checkpoint_entries = self._log_entries
+            if os.path.exists(self.legacy_checkpoint_path):
+                os.remove(self.legacy_checkpoint_path)
+
+    def _after_write(self) -> None:
+        # Checkpoint the index periodically; a stale checkpoint is caught up from the log on startup
+        if self._log_entries - self._checkpoint_entries >= self.checkpoint_every:
+            self.save()
+
+    def add_plan(self, trip_plan: str, metadata: Dict, plan_id: Optional[int] = None) -> int:
+        # Returns the new plan's ID, or the existing ID if this user already saved the same plan
+        return self._add_batch([(trip_plan, metadata, plan_id)])[0]
+
+    def add_plans(self, plans: Iterable[Tuple[str, Dict]], chunk_size: int = 256) -> List[int]:
+        # Bulk import: stream plans in chunks, encode each chunk in one batch and persist it with one log append
+        plan_ids: List[int] = []
+        chunk: List[Tuple[str, Dict, Optional[int]]] = []
+        for trip_plan, metadata in plans:
+            chunk.append((trip_plan, metadata, None))
+            if len(chunk) >= chunk_size:
+                plan_ids.extend(self._add_batch(chunk))
+                chunk = []
+        if chunk:
+            plan_ids.extend(self._add_batch(chunk))
+        return plan_ids
+
+    @staticmethod
+    def _embedding_text(trip_plan: str, metadata: Dict) -> str:
+        return f"{metadata.get('location', '')} {metadata.get('date_range', '')} {trip_plan}"
+
+    def _encode_plans(self, texts: List[str]) -> np.ndarray:
+        # Generate the embeddings for a whole chunk in one forward pass
+        with timed("vector_encode_batch"):
+            embeddings: np.ndarray = np.asarray(self.encoder.encode(texts, remember=False), dtype=np.float32).reshape(len(texts), -1)
+        if embeddings.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self.dimension}")
+        return embeddings
+
+    def _add_batch(self, items: List[Tuple[str, Dict, Optional[int]]], embeddings: Optional[np.ndarray] = None) -> List[int]:
+        for trip_plan, metadata, _ in items:
+            # Ensure the trip plan is included in the metadata
+            metadata['trip_plan'] = trip_plan
+            metadata['content_hash'] = content_hash(trip_plan)
+        keys = [self._dedupe_key(metadata) for _, metadata, _ in items]
+
+        vectors: Dict[Tuple[Optional[str], str], np.ndarray] = {}
+        if embeddings is not None:
+            vectors = dict(zip(keys, embeddings))
         else:
-            # Return a message indicating no plan was found
-            raise IndexError("No matching trip plan found.")
+            # Encode outside the lock so saving plans never blocks searches; plans already stored are skipped
+            with self._lock:
+                stored = {key for key in keys if key in self._hashes}
+            to_encode = {key: self._embedding_text(trip_plan, metadata) for key, (trip_plan, metadata, _) in zip(keys, items) if key not in stored}
+            if to_encode:
+                vectors = dict(zip(to_encode, self._encode_plans(list(to_encode.values()))))
+
+        plan_ids: List[Optional[int]] = []
+        new_items: List[Tuple[int, str, Dict, Tuple[Optional[str], str]]] = []
+        with self._lock:
+            pending: Dict[Tuple[Optional[str], str], int] = {}
+            for (trip_plan, metadata, plan_id), key in zip(items, keys):
+                existing = self._hashes.get(key, pending.get(key))
+                if existing is not None:
+                    plan_ids.append(existing)
+                    continue
+
+                if plan_id is None:
+                    plan_id = self._next_id
+                self._next_id = max(self._next_id, plan_id + 1)
+                pending[key] = plan_id
+                plan_ids.append(plan_id)
+                new_items.append((plan_id, trip_plan, metadata, key))
+
+            if not new_items:
+                return plan_ids
+
+            # Only a stored duplicate deleted since the check above is still missing its embedding
+            missing = [(key, self._embedding_text(trip_plan, metadata)) for _, trip_plan, metadata, key in new_items if key not in vectors]
+            if missing:
+                vectors.update(zip([key for key, _ in missing], self._encode_plans([text for _, text in missing])))
+            embeddings = np.stack([vectors[key] for _, _, _, key in new_items])
+
+            # Appending to the log is the only disk write in the common case
+            self._append_log([
+                {"op": "add", "id": plan_id, "metadata": metadata, "embedding": self._encode_vector(embedding)}
+                for (plan_id, _, metadata, _), embedding in zip(new_items, embeddings)
+            ])
+            for plan_id, _, metadata, _ in new_items:
+                self.metadata[plan_id] = metadata
+                self._index_metadata(plan_id, metadata)
+            self._index_add([plan_id for plan_id, _, _, _ in new_items], embeddings,
+                            range(self._log_entries - len(new_items), self._log_entries))
+            for user_id in {metadata.get("user_id") for _, _, metadata, _ in new_items}:
+                self._maybe_partition(user_id)
+            self._after_write()
+        return plan_ids
+
+    def _maybe_partition(self, user_id: Optional[str]) -> None:
+        if user_id is None or str(user_id) in self._partitions:
+            return
+        if len(self._postings["user_id"].get(str(user_id), ())) >= self.partition_threshold:
+            self._build_partitions(self._live_records(self._read_log()), [str(user_id)])
+
+    def delete_plan(self, plan_id: int) -> None:
+        with self._lock:
+            if plan_id not in self.metadata:
+                raise KeyError(f"No trip plan with id {plan_id}.")
+            self._append_log([{"op": "delete", "id": plan_id}])
+            self._index_remove(plan_id)
+            self._unindex_metadata(plan_id, self.metadata[plan_id])
+            del self.metadata[plan_id]
+            self._after_write()
+
+    def update_plan(self, plan_id: int, trip_plan: str, metadata: Dict) -> None:
+        embedding = self._encode_plans([self._embedding_text(trip_plan, metadata)])  # Outside the lock, like _add_batch
+        with self._lock:
+            if plan_id not in self.metadata:
+                raise KeyError(f"No trip plan with id {plan_id}.")
+            # add_plan would return the other plan's ID and the update would silently become a delete
+            duplicate = self._hashes.get(self._dedupe_key({"user_id": metadata.get("user_id"), "trip_plan": trip_plan}))
+            if duplicate is not None and duplicate != plan_id:
+                raise ValueError(f"Trip plan {duplicate} already has this content.")
+            self.delete_plan(plan_id)
+            self._add_batch([(trip_plan, metadata, plan_id)], embedding)
+
+    def _candidates(self, filters: Dict[str, Any]) -> Optional[Set[int]]:
+        # Intersect postings for each filter; None means "no filtering"
+        candidates: Optional[Set[int]] = None
+        for field in FILTER_FIELDS:
+            if filters.get(field) is None:
+                continue
+            postings = self._postings[field].get(self._field_value(field, filters))
+            matched = set(postings) if postings else set()
+            candidates = matched if candidates is None else candidates & matched
+
+        # date_from / date_to select an inclusive range of ISO dates
+        date_from, date_to = filters.get("date_from"), filters.get("date_to")
+        if date_from is not None or date_to is not None:
+            matched = set()
+            for date, plan_ids in self._postings["date_range"].items():
+                if (date_from is None or date >= date_from) and (date_to is None or date <= date_to):
+                    matched |= plan_ids
+            candidates = matched if candidates is None else candidates & matched
+        return candidates
+
+    def _search_params(self, index: faiss.Index, selector: faiss.IDSelector, exhaustive: bool = False) -> faiss.SearchParameters:
+        base = faiss.downcast_index(index.index)
+        if isinstance(base, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(base.hnsw.efSearch, 64))
+        if isinstance(base, faiss.IndexIVF):
+            # Probing every list visits every candidate, so a small filtered set loses no recall
+            return faiss.SearchParametersIVF(sel=selector, nprobe=base.nlist if exhaustive else base.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    def _tombstone_filter(self) -> faiss.IDSelector:
+        # Keeps tombstoned vectors out of the graph search itself, so k does not have to grow with them
+        if self._live_selector is None:
+            deleted = faiss.IDSelectorBatch(np.array(sorted(self._deleted), dtype=np.int64))
+            self._live_selector = (deleted, faiss.IDSelectorNot(deleted))  # The Not selector does not own `deleted`
+        return self._live_selector[1]
+
+    def _search(self, query_embedding: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        # Returns (plan_id, cosine similarity) pairs, best first
+        with self._lock:
+            return self._search_locked(query_embedding, top_k, filters)
+
+    def _search_locked(self, query_embedding: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]]) -> List[Tuple[int, float]]:
+        index = self.index
+        candidates = self._candidates(filters) if filters else None
+        if candidates is not None:
+            if not candidates:
+                return []
+            # Large tenants are searched in their own exact sub-index
+            user_id = filters.get("user_id")
+            if user_id is not None and str(user_id) in self._partitions:
+                index = self._partitions[str(user_id)]
+        if index.ntotal == 0:
+            return []
+
+        query_vector = self._normalize(query_embedding.reshape(1, -1))
+        small = candidates is not None and len(candidates) <= EXACT_SEARCH_LIMIT
+        if small and isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW):
+            return self._exact_search(index, query_vector, candidates, top_k)
+
+        # Partitions are exact sub-indexes keyed by plan ID; the main index may hold tombstones and remapped IDs
+        main = index is self.index
+        params = None
+        k = min(index.ntotal, top_k)
+        if candidates is not None:
+            # Restrict the vector search to the candidate IDs instead of filtering a global top-k.
+            # Candidates are live plans, whose FAISS IDs are never tombstoned.
+            faiss_ids = sorted(self._faiss_id(plan_id) for plan_id in candidates) if main else sorted(candidates)
+            selector = faiss.IDSelectorBatch(np.array(faiss_ids, dtype=np.int64))
+            params = self._search_params(index, selector, exhaustive=small)
+            k = min(k, len(candidates))
+        elif main and self._deleted:
+            params = self._search_params(index, self._tombstone_filter())
+        with timed("vector_search"):
+            scores, ids = index.search(query_vector, k, params=params)
+
+        results: List[Tuple[int, float]] = []
+        seen: Set[int] = set()
+        for score, faiss_id in zip(scores[0], ids[0]):
+            faiss_id = int(faiss_id)
+            if faiss_id < 0 or (main and faiss_id in self._deleted):
+                continue
+            plan_id = self._plan_ids.get(faiss_id, faiss_id) if main else faiss_id
+            if plan_id not in self.metadata or plan_id in seen:
+                continue
+            seen.add(plan_id)
+            results.append((plan_id, float(score)))
+        return results[:top_k]
+
+    def _exact_search(self, index: faiss.Index, query_vector: np.ndarray, candidates: Set[int], top_k: int) -> List[Tuple[int, float]]:
+        # HNSW only applies the filter to the nodes it visits; score a small candidate set directly instead
+        plan_ids = [plan_id for plan_id in sorted(candidates) if plan_id in self.metadata]
+        if not plan_ids:
+            return []
+        with timed("vector_search"):
+            vectors = index.reconstruct_batch(np.array([self._faiss_id(plan_id) for plan_id in plan_ids], dtype=np.int64))
+            scores = vectors @ query_vector[0]
+        best = np.argsort(-scores)[:top_k]
+        return [(plan_ids[i], float(scores[i])) for i in best]
+
+    def search_plan(self, query: str, filters: Optional[Dict[str, Any]] = None, top_k: int = 1) -> List[Dict]:
+        # filters may hold user_id, location, date_range, date_from and date_to
+        with timed("vector_encode"):
+            query_embedding: np.ndarray = self.encoder.encode(query)
+        with self._lock:
+            return [{**self.metadata[plan_id], "id": plan_id, "score": score} for plan_id, score in self._search(query_embedding, top_k, filters)]
+
+    def retrieve_trip_plan(self, location: str, user_id: Optional[str] = None) -> str:
+        with timed("vector_encode"):
+            query_embedding: np.ndarray = self.encoder.encode(f"{location}")
+        filters: Dict[str, Any] = {"user_id": user_id} if user_id is not None else {}
+
+        with self._lock:
+            # A plan saved for exactly this location wins; otherwise fall back to the nearest location
+            results = self._search(query_embedding, 1, {**filters, "location": location})
+            if results:
+                return self.metadata[results[0][0]]['trip_plan']
+            results = self._search(query_embedding, 1, filters or None)
 
+            # Check if the closest match is within the acceptable similarity
+            if results and results[0][1] >= self.min_similarity:
+                return self.metadata[results[0][0]]['trip_plan']
+            else:
+                # Return a message indicating no plan was found
+                raise IndexError("No matching trip plan found.")
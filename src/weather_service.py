@@ -1,32 +1,82 @@
-import requests
-from typing import Dict, Any
-from datetime import datetime
+from collections import Counter
+from typing import Dict, Any, List, Optional, Union
+from datetime import datetime, timedelta
+from cache import FORECAST_TTL, TTLCache, normalize_location
+from http_client import HttpClient
+
+# OpenWeatherMap's free tier allows 60 calls per minute
+RATE_LIMIT = 1.0
+BASE_URL = "http://api.openweathermap.org"
+
+def forecast_days(weather: Union[None, Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    # The usable days in a get_forecast result (one day, possibly an error dict) or a get_forecast_range list
+    days = weather if isinstance(weather, list) else [weather]
+    return [day for day in days if day and "error" not in day]
 
 class WeatherService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[Any] = None, http: Optional[HttpClient] = None, base_url: str = BASE_URL):
         self.api_key = api_key
+        self.base_url = base_url
+        # One cached forecast covers every date in its 5-day window
+        self.cache = cache if cache is not None else TTLCache(FORECAST_TTL)
+        self.http = http or HttpClient()
+        self.http.limit(api_key, RATE_LIMIT, capacity=5)
 
-    def get_forecast(self, location: str, date: str) -> Dict[str, Any]:
-        url = f"http://api.openweathermap.org/data/2.5/forecast?q={location}&appid={self.api_key}&units=metric"
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for bad responses
-        data = response.json()
+    @staticmethod
+    def _aggregate_days(slots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        # Group the 3-hour slots by date and summarise each day once
+        by_date: Dict[str, List[Dict[str, Any]]] = {}
+        for forecast in slots:
+            by_date.setdefault(forecast['dt_txt'].split(' ')[0], []).append(forecast)
+
+        days: Dict[str, Dict[str, Any]] = {}
+        for date, day_slots in by_date.items():
+            temperatures = [forecast['main']['temp'] for forecast in day_slots]
+            descriptions = Counter(forecast['weather'][0]['description'] for forecast in day_slots)
+            days[date] = {
+                'date': date,
+                'temperature': round(sum(temperatures) / len(temperatures), 2),
+                'temp_min': min(temperatures),
+                'temp_max': max(temperatures),
+                'description': descriptions.most_common(1)[0][0]
+            }
+        return days
 
-        # Convert input date to datetime for comparison
+    def get_daily_forecast(self, location: str) -> Dict[str, Dict[str, Any]]:
+        # Date-indexed per-day aggregates for the whole 5-day window, fetched and parsed once per TTL
+        key = f"daily:{normalize_location(location)}"
+        days = self.cache.get(key)
+        if days is not None:
+            return days
+
+        url = f"{self.base_url}/data/2.5/forecast"
+        params = {"q": location, "appid": self.api_key, "units": "metric"}
+        response = self.http.get(url, params=params, rate_limit_key=self.api_key)  # Raises after retries on bad responses
+        days = self._aggregate_days(response.json()['list'])
+        self.cache.set(key, days)
+        return days
+
+    def get_forecast(self, location: str, date: str) -> Dict[str, Any]:
+        # Convert input date to the forecast's date format
         target_date_str = datetime.strptime(date, '%Y-%m-%d').strftime('%Y-%m-%d')
 
-        # Iterate over the forecast data to find the closest match to the target date
-        for forecast in data['list']:
-            forecast_date = forecast['dt_txt'].split(' ')[0]
-            if forecast_date == target_date_str:
-                weather_details = {
-                    'date': forecast_date,
-                    'location': location,
-                    'temperature': forecast['main']['temp'],
-                    'description': forecast['weather'][0]['description']
-                }
-                return weather_details
+        day = self.get_daily_forecast(location).get(target_date_str)
+        if day:
+            return {**day, 'location': location}
 
         # If no matching date is found, return an error message
         return {"error": f"No weather data available for {date} in {location}."}
 
+    def get_forecast_range(self, location: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        # Every day of a multi-day trip from a single upstream call; days outside the forecast window are skipped.
+        # Not yet reachable from queries, which only carry one date; the planner and plan cache accept its result.
+        days = self.get_daily_forecast(location)
+        current = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        forecasts: List[Dict[str, Any]] = []
+        while current <= end:
+            day = days.get(current.strftime('%Y-%m-%d'))
+            if day:
+                forecasts.append({**day, 'location': location})
+            current += timedelta(days=1)
+        return forecasts
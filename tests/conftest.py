@@ -0,0 +1,59 @@
+import os
+import sys
+from collections import Counter
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app imports its modules by name from src/; the fakes live next to the benchmarks
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")]
+
+from fakes import FakeChatModel, HashingEncoder
+from plan_cache import PlanCache
+from trip_planner import TripPlanner
+from vector_store import VectorStore
+
+DATE = "2024-08-29"
+
+class FakeWeather:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_forecast(self, location, date):
+        self.calls["weather"] += 1
+        return {"date": date, "location": location, "temperature": 21.0, "temp_min": 18.0, "temp_max": 24.0, "description": "clear sky"}
+
+class FakeHotels:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_hotels(self, location):
+        self.calls["hotels"] += 1
+        return [f"{location} Grand Hotel"]
+
+class CountingPlanner(TripPlanner):
+    def generate_location_overview(self, location):
+        self.calls["location_overview"] += 1
+        return f"{location} is lovely."
+
+@pytest.fixture
+def calls():
+    return Counter()
+
+@pytest.fixture
+def planner(calls):
+    planner = CountingPlanner(FakeWeather(calls), FakeHotels(calls), llm=FakeChatModel(latency=0, tokens_per_second=1e6),
+                              plan_cache=PlanCache(HashingEncoder().encode))
+    planner.calls = calls
+    return planner
+
+@pytest.fixture
+def encoder():
+    return HashingEncoder()
+
+@pytest.fixture
+def open_store(tmp_path, encoder):
+    def open_store(**kwargs):
+        return VectorStore(dimension=encoder.get_sentence_embedding_dimension(), index_path=str(tmp_path / "trip_plan_index.faiss"),
+                           metadata_path=str(tmp_path / "trip_plan_metadata.json"), log_path=str(tmp_path / "trip_plan_log.jsonl"),
+                           model=encoder, **kwargs)
+    return open_store
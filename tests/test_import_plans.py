@@ -0,0 +1,17 @@
+import json
+from import_plans import read_jsonl
+
+def test_read_jsonl_replays_a_store_log(tmp_path, open_store):
+    store = open_store()
+    ids = store.add_plans([(f"Plan {i}", {"location": "Rome", "date_range": "2024-09-01"}) for i in range(3)])
+    store.delete_plan(ids[0])
+    store.update_plan(ids[1], "Plan 1, revised", {"location": "Rome", "date_range": "2024-09-02"})
+
+    plans = list(read_jsonl(str(tmp_path / "trip_plan_log.jsonl")))
+    assert sorted(trip_plan for trip_plan, _ in plans) == ["Plan 1, revised", "Plan 2"]
+    assert all("content_hash" not in metadata for _, metadata in plans)
+
+def test_read_jsonl_reads_plain_exports(tmp_path):
+    path = tmp_path / "export.jsonl"
+    path.write_text(json.dumps({"trip_plan": "Beaches", "location": "Nice", "date_range": "2024-09-01"}) + "\n\n")
+    assert list(read_jsonl(str(path))) == [("Beaches", {"location": "Nice", "date_range": "2024-09-01"})]
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from plan_cache import PlanCache, similar_spelling, weather_bucket
+
+WEATHER = {"temperature": 31.0, "description": "clear sky"}
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("saudia arabia", "saudi arabia", True),
+    ("untied states", "united states", True),
+    ("barcelona", "barcelona", True),
+    ("north korea", "south korea", False),
+    ("austria", "australia", False),
+    ("gambia", "zambia", False),
+    ("iran", "iraq", False),
+    ("slovenia", "slovakia", False),
+    ("new york", "new york city", False),
+])
+def test_similar_spelling(a, b, expected):
+    assert similar_spelling(a, b) is expected
+
+def test_near_identical_embeddings_only_merge_typos():
+    # Every spelling embeds identically, so only the spelling guard keeps places apart
+    cache = PlanCache(lambda text: np.ones(8, dtype=np.float32))
+    cache.set(cache.key("Saudi Arabia", "2024-09-01", WEATHER), "Desert plan", {})
+    cache.set(cache.key("North Korea", "2024-09-01", WEATHER), "Pyongyang plan", {})
+    cache.set(cache.key("Austria", "2024-09-01", WEATHER), "Alps plan", {})
+
+    assert cache.get(cache.key("saudia arabia", "2024-09-01", WEATHER))[0] == "Desert plan"
+    assert cache.get(cache.key("South Korea", "2024-09-01", WEATHER)) is None
+    assert cache.get(cache.key("Australia", "2024-09-01", WEATHER)) is None
+
+@pytest.mark.parametrize("weather, expected", [
+    (None, "unknown"),
+    ({"error": "No weather data available"}, "unknown"),
+    (WEATHER, "30c-clear"),
+    ([WEATHER, {"temperature": 18.5, "description": "light rain"}], "30c-clear,15c-rain"),
+    ([], "unknown"),
+])
+def test_weather_bucket_accepts_single_days_and_ranges(weather, expected):
+    assert weather_bucket(weather) == expected
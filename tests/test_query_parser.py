@@ -0,0 +1,42 @@
+import pytest
+from query_parser import quick_extract
+
+@pytest.mark.parametrize("query, expected", [
+    ("create a plan to Rome on 2024-08-29", {"intent": "create", "location": "Rome", "date": "2024-08-29"}),
+    ("Plan a trip to New York on 30th August", {"intent": "create", "location": "New York", "date": "2024-08-30"}),
+    ("Please plan a vacation for Saudi Arabia on August 31st, 2025.", {"intent": "create", "location": "Saudi Arabia", "date": "2025-08-31"}),
+    ("plan my holiday to Dubai on 1 September", {"intent": "create", "location": "Dubai", "date": "2024-09-01"}),
+    ("look up my plan to Dubai", {"intent": "retrieve", "location": "Dubai", "date": None}),
+    ("show me my saved trip to Paris", {"intent": "retrieve", "location": "Paris", "date": None}),
+])
+def test_accepted_shapes(query, expected):
+    assert quick_extract(query) == expected
+
+@pytest.mark.parametrize("query", [
+    # Negations and questions
+    "I don't want a plan for Paris, show me my saved plan for Rome",
+    "do not plan a trip to Rome on 2024-08-29",
+    "plan a trip to Rome on 2024-08-29 instead of Milan",
+    "plan for rain in London?",
+    "can you plan a trip to Rome on 2024-08-29?",
+    # Two place candidates
+    "plan a trip to Rome on 2024-08-29 with a stop in Florence",
+    "plan a trip from Paris to Rome on 2024-08-29 for Anna",
+    # Lowercase places and a capitalised "On"
+    "plan a trip to rome on 2024-08-29",
+    "plan a trip to Rome On 2024-08-29",
+    # Unparseable or impossible dates
+    "plan a trip to Rome on someday soon",
+    "plan a trip to Rome on 2024-02-30",
+    "plan a trip to Rome on 31st June",
+    # Not a destination or not the supported shape
+    "plan two days in Rome",
+    "plan a trip for next week",
+    "plan a trip for this weekend",
+    "plan a trip for Business on 2024-08-29",
+    "plan a trip to Rome",
+    "what's the weather like",
+    "create and retrieve my plan to Rome",
+])
+def test_rejected_queries_go_to_the_llm(query):
+    assert quick_extract(query) is None
@@ -0,0 +1,56 @@
+from collections import Counter
+from conftest import DATE, FakeWeather
+from service import TripService
+
+COMPLETE = {"weather": {"temperature": 20.0, "description": "clear sky"}, "hotels": ["Grand"], "location_overview": "Lovely."}
+
+class StubPlanner:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def gather_trip_data(self, location, date, known=None):
+        self.calls += 1
+        return dict(self.results.pop(0))
+
+def _service(planner):
+    return TripService(planner, llm=None, vector_store=lambda: None)
+
+def test_trip_data_is_shared_when_complete():
+    planner = StubPlanner([COMPLETE])
+    service = _service(planner)
+    assert service.trip_data("Rome", "2024-08-29") == COMPLETE
+    assert service.trip_data("rome", "2024-08-29") == COMPLETE
+    assert planner.calls == 1
+
+def test_degraded_trip_data_is_not_reused():
+    planner = StubPlanner([{**COMPLETE, "weather": None, "hotels": []}, COMPLETE])
+    service = _service(planner)
+    assert service.trip_data("Rome", "2024-08-29")["weather"] is None
+    assert service.trip_data("Rome", "2024-08-29") == COMPLETE
+    assert planner.calls == 2
+
+class FailingWeather(FakeWeather):
+    def get_forecast(self, location, date):
+        super().get_forecast(location, date)
+        raise ConnectionError("upstream down")
+
+def _analysis(location):
+    return {"intent": "create", "location": location, "date": DATE, "prompt": "", "response": ""}
+
+def test_create_hit_makes_no_hotel_or_overview_calls(planner, calls):
+    service = _service(planner)
+    first = service.create("q", _analysis("Rome"))
+    calls.clear()
+    assert service.create("q", _analysis("Rome"))["trip_plan"] == first["trip_plan"]
+    assert calls == Counter(weather=1)
+
+def test_create_during_weather_outage_requests_weather_once(planner, calls):
+    service = _service(planner)
+    service.create("q", _analysis("Rome"))
+    planner.weather_service = FailingWeather(calls)
+    for location in ("Rome", "Oslo"):  # With and without a cached plan for the place
+        calls.clear()
+        result = service.create("q", _analysis(location))
+        assert result["trip_plan"]
+        assert calls["weather"] == 1
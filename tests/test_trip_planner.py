@@ -0,0 +1,43 @@
+import time
+from collections import Counter
+from conftest import DATE, FakeWeather
+from trip_planner import is_complete
+
+def test_generate_plan_cache_hit_skips_hotels_and_overview(planner, calls):
+    first = planner.generate_plan("Rome", DATE)
+    calls.clear()
+    assert planner.generate_plan("Rome", DATE) == first
+    assert calls == Counter(weather=1)
+
+def test_stream_plan_cache_hit_skips_hotels_and_overview(planner, calls):
+    "".join(planner.stream_plan("Rome", DATE))
+    calls.clear()
+    trip_data = {}
+    streamed = "".join(planner.stream_plan("Rome", DATE, trip_data))
+    assert streamed.startswith("## Trip Plan for Rome")
+    assert calls == Counter(weather=1)
+    assert trip_data["hotels"] == ["Rome Grand Hotel"]
+
+def test_force_refresh_fetches_everything(planner, calls):
+    planner.generate_plan("Rome", DATE)
+    calls.clear()
+    planner.generate_plan("Rome", DATE, force_refresh=True)
+    assert calls == Counter(weather=1, hotels=1, location_overview=1)
+
+def test_stream_plan_without_cached_place_streams_sections_before_weather(planner, calls):
+    class SlowWeather(FakeWeather):
+        def get_forecast(self, location, date):
+            time.sleep(0.5)
+            return super().get_forecast(location, date)
+
+    planner.weather_service = SlowWeather(calls)
+    chunks = planner.stream_plan("Oslo", DATE)
+    assert next(chunks).startswith("## Trip Plan for Oslo")
+    assert not next(chunks).startswith("### Weather Forecast")
+
+def test_is_complete_accepts_forecast_ranges():
+    day = {"date": DATE, "location": "Rome", "temperature": 21.0, "temp_min": 18.0, "temp_max": 24.0, "description": "clear sky"}
+    trip_data = {"hotels": ["Grand"], "location_overview": "Lovely."}
+    assert is_complete({**trip_data, "weather": [day, day]})
+    assert not is_complete({**trip_data, "weather": []})
+    assert not is_complete({**trip_data, "weather": {"error": "No weather data"}})
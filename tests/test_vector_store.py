@@ -0,0 +1,113 @@
+import json
+import threading
+import pytest
+
+def _plans(count, location="Rome"):
+    return [(f"Day {i} in {location}: museums and food markets", {"location": location, "date_range": "2024-09-01", "user_id": "u1"})
+            for i in range(count)]
+
+def test_add_delete_update_survive_reload(open_store):
+    store = open_store(checkpoint_every=2)
+    ids = store.add_plans(_plans(5))
+    store.delete_plan(ids[0])
+    store.update_plan(ids[1], "A quiet week of beaches", {"location": "Nice", "date_range": "2024-09-02", "user_id": "u1"})
+
+    reloaded = open_store()
+    assert sorted(reloaded.metadata) == ids[1:]
+    assert reloaded.metadata[ids[1]]["location"] == "Nice"
+    assert reloaded.retrieve_trip_plan("Nice", user_id="u1") == "A quiet week of beaches"
+    assert all(result["id"] != ids[0] for result in reloaded.search_plan("Day 0 in Rome", top_k=5))
+
+def test_duplicate_plan_returns_existing_id(open_store):
+    store = open_store()
+    first = store.add_plan(*_plans(1)[0])
+    assert store.add_plan(*_plans(1)[0]) == first
+    assert len(store.metadata) == 1
+
+def test_torn_final_line_is_truncated(open_store, tmp_path):
+    open_store().add_plans(_plans(3))
+    log_path = tmp_path / "trip_plan_log.jsonl"
+    with open(log_path, "a") as f:
+        f.write('{"op": "add", "id": 3, "meta')
+
+    store = open_store()
+    assert sorted(store.metadata) == [0, 1, 2]
+    assert log_path.read_text().endswith("\n")
+    store.add_plan(*_plans(4)[3])
+    assert len(open_store().metadata) == 4
+
+def test_corrupt_line_before_the_end_raises(open_store, tmp_path):
+    open_store().add_plans(_plans(3))
+    log_path = tmp_path / "trip_plan_log.jsonl"
+    lines = log_path.read_text().splitlines(keepends=True)
+    lines[1] = "not json\n"
+    log_path.write_text("".join(lines))
+
+    with pytest.raises(ValueError, match="line 2"):
+        open_store()
+
+def test_stale_checkpoint_is_caught_up_from_the_log(open_store, tmp_path, encoder):
+    store = open_store(checkpoint_every=1000)
+    store.add_plans(_plans(2))
+    store.save()
+    checkpoint = (tmp_path / "trip_plan_index.faiss").read_bytes()
+    ids = store.add_plans(_plans(2, location="Lisbon"))
+    store.delete_plan(0)
+
+    # Put back the older checkpoint, as if the process died before the next save
+    (tmp_path / "trip_plan_index.faiss").write_bytes(checkpoint)
+    reloaded = open_store()
+    assert sorted(reloaded.metadata) == [1] + ids
+    assert reloaded.index.ntotal == 3
+    assert reloaded.retrieve_trip_plan("Lisbon", user_id="u1").endswith("Lisbon: museums and food markets")
+    header = json.loads((tmp_path / "trip_plan_index.faiss").read_bytes().split(b"\n", 1)[0])
+    assert header["entries"] == reloaded._log_entries
+
+def test_hnsw_update_does_not_resurface_old_text(open_store):
+    store = open_store(index_type="hnsw")
+    ids = store.add_plans(_plans(20))
+    index = store.index
+    store.update_plan(ids[3], "Surfing lessons and seafood", {"location": "Rome", "date_range": "2024-09-01", "user_id": "u1"})
+    store.update_plan(ids[3], "Surfing lessons, seafood and sunsets", {"location": "Rome", "date_range": "2024-09-01", "user_id": "u1"})
+    assert store.index is index  # Updated in place, not rebuilt
+
+    for reopened in (store, open_store(index_type="hnsw")):
+        results = reopened.search_plan("Day 3 in Rome: museums and food markets", top_k=20)
+        assert [result["id"] for result in results].count(ids[3]) <= 1
+        assert all(result["trip_plan"] != "Day 3 in Rome: museums and food markets" for result in results)
+        assert reopened.search_plan("Surfing lessons, seafood and sunsets")[0]["id"] == ids[3]
+        assert reopened.search_plan("sunsets", filters={"location": "Rome"})[0]["id"] == ids[3]
+
+def test_hnsw_update_colliding_with_another_plan_raises(open_store):
+    store = open_store(index_type="hnsw")
+    ids = store.add_plans(_plans(2))
+    with pytest.raises(ValueError):
+        store.update_plan(ids[1], _plans(1)[0][0], _plans(1)[0][1])
+
+def test_small_filtered_search_on_hnsw_finds_every_candidate(open_store):
+    store = open_store(index_type="hnsw")
+    store.add_plans(_plans(200) + _plans(3, location="Oslo"))
+    results = store.search_plan("Oslo", filters={"location": "Oslo"}, top_k=5)
+    assert len(results) == 3
+
+def test_search_is_not_blocked_while_a_plan_is_encoded(open_store, encoder):
+    store = open_store()
+    store.add_plans(_plans(3))
+    encoding, release = threading.Event(), threading.Event()
+
+    class BlockingEncoder:
+        def encode(self, texts, **kwargs):
+            encoding.set()
+            release.wait(5)
+            return encoder.encode(texts)
+
+    store.encoder = BlockingEncoder()
+    writer = threading.Thread(target=store.add_plan, args=("A slow plan to encode", {"location": "Oslo", "date_range": "2024-09-03"}))
+    writer.start()
+    assert encoding.wait(5)
+    searched = threading.Event()
+    threading.Thread(target=lambda: (store._search(encoder.encode("Rome"), 1), searched.set()), daemon=True).start()
+    assert searched.wait(2)
+    release.set()
+    writer.join()
+    assert len(store.metadata) == 4